@@ -0,0 +1,122 @@
+"""
+Conditions Benchmark
+Cost of conditions mixing cheap tests and pixel probes, short-circuit
+evaluation against evaluating every operand
+
+Usage (from the project folder):
+    python -m benchmarks.conditions [--count 2000] [--probe-us 1000]
+
+The screen is never read: pixel() is replaced by a stub that spins for
+--probe-us microseconds (about the cost of one screen grab) and counts
+its calls. The executor drives a FakeBackend on a VirtualClock.
+"""
+import argparse
+import time
+import timeit
+from commands.backend import FakeBackend
+from engine.context import ExecutionContext
+from engine.executor import MacroExecutor
+from utils.timing import VirtualClock
+
+PIXEL = 'pixel(10, 20, "#FF0000")'
+
+# (condition, 'and'/'or', operands): what eager evaluation would compute
+CONDITIONS = (
+    (f'$ready == 1 and {PIXEL}', 'and', ('$ready == 1', PIXEL)),
+    (f'$hp > 10 or {PIXEL}', 'or', ('$hp > 10', PIXEL)),
+    (f'exists($target) and {PIXEL}', 'and', ('exists($target)', PIXEL)),
+    (f'$ready == 0 and $hp > 10 and {PIXEL}', 'and', ('$ready == 0', '$hp > 10', PIXEL)),
+    (f'{PIXEL} and $hp > 10', 'and', (PIXEL, '$hp > 10')),
+)
+
+
+class PixelProbe:
+    """Stand-in for pixel(): spins for a fixed time and counts its calls"""
+
+    def __init__(self, cost):
+        """
+        Initialize probe
+
+        Args:
+            cost: Seconds spent per call
+        """
+        self.cost = cost
+        self.calls = 0
+
+    def __call__(self, x, y, color, tolerance=10):
+        self.calls += 1
+        end = time.perf_counter() + self.cost
+        while time.perf_counter() < end:
+            pass
+        return True
+
+
+def make_executor(probe):
+    """
+    Build an executor with the probe as pixel() and a few variables
+
+    Args:
+        probe: PixelProbe instance
+
+    Returns:
+        MacroExecutor instance
+    """
+    clock = VirtualClock()
+    context = ExecutionContext(input_backend=FakeBackend(clock=clock))
+    context.set_variable('$ready', 0)
+    context.set_variable('$hp', 50)
+    executor = MacroExecutor(context, clock=clock)
+    executor.expr_functions['pixel'] = probe
+    return executor
+
+
+def measure(stmt, probe, count):
+    """
+    Time a callable and count the probes it made
+
+    Args:
+        stmt: Callable to time
+        probe: PixelProbe used by the callable
+        count: Number of calls
+
+    Returns:
+        Tuple of (microseconds per call, probes per call)
+    """
+    stmt()                              # Compile the expressions once
+    probe.calls = 0
+    seconds = timeit.timeit(stmt, number=count)
+    return seconds / count * 1e6, probe.calls / count
+
+
+def main(argv=None):
+    """
+    Command-line entry point
+
+    Args:
+        argv: Argument list (default: sys.argv[1:])
+    """
+    arg_parser = argparse.ArgumentParser(prog='python -m benchmarks.conditions',
+                                         description="Measure mixed cheap/expensive conditions")
+    arg_parser.add_argument('--count', type=int, default=2000,
+                            help="Evaluations per condition")
+    arg_parser.add_argument('--probe-us', type=float, default=1000.0,
+                            help="Cost of one pixel probe in microseconds")
+    args = arg_parser.parse_args(argv)
+
+    probe = PixelProbe(args.probe_us / 1e6)
+    executor = make_executor(probe)
+    evaluate = executor._evaluate_condition
+
+    print(f"Pixel probe: {args.probe_us:g} us, {args.count} evaluations per condition")
+    print(f"  {'condition':<56}{'short-circuit':>16}{'every operand':>16}")
+    for condition, operator, operands in CONDITIONS:
+        combine = all if operator == 'and' else any
+        lazy_us, lazy_probes = measure(lambda: evaluate(condition), probe, args.count)
+        eager_us, eager_probes = measure(
+            lambda: combine([evaluate(operand) for operand in operands]), probe, args.count)
+        print(f"  {condition:<56}{lazy_us:>11.1f} us {lazy_probes:g}p"
+              f"{eager_us:>11.1f} us {eager_probes:g}p")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Dispatch Benchmark
+Per-command cost of the registry dispatch against the former if/elif chain
+
+Usage (from the project folder):
+    python -m benchmarks.dispatch [--count 40000] [--repeat 5]
+
+Nothing is sent to the keyboard or mouse: the executor drives a
+FakeBackend on a VirtualClock. The dispatch table compares both ways of
+finding the handler with no-op command bodies; the execution table runs
+compiled instructions through MacroExecutor.execute with the real ones.
+"""
+import argparse
+import timeit
+from commands.backend import FakeBackend
+from engine.compiler import compile_line
+from engine.context import ExecutionContext
+from engine.executor import MacroExecutor
+from utils.timing import VirtualClock
+
+# One sample line per command, from the top of the old chain to the bottom
+SAMPLES = (
+    ('press', 'press,a,0.01'),
+    ('click', 'click,10,20,left'),
+    ('scroll', 'scroll,up,3'),
+    ('wait', 'wait,0.01'),
+    ('echo', 'echo,hello'),
+    ('unknown', 'beep,1'),
+)
+
+
+def chain_dispatch(executor, cmd, args, speed, log_callback):
+    """
+    The if/elif chain MacroExecutor used before the CommandRegistry
+
+    Args:
+        executor: MacroExecutor whose command objects run the commands
+        cmd: Opcode
+        args: Decoded arguments
+        speed: Speed multiplier
+        log_callback: Logging callback
+    """
+    if cmd == 'press':
+        keys, duration = args
+        executor.kb_commands.press(keys, duration, speed)
+    elif cmd == 'hotkey':
+        executor.kb_commands.hotkey(args[0])
+    elif cmd == 'type':
+        executor.kb_commands.type_text(args[0], speed)
+    elif cmd in ['lmc', 'rmc', 'mmc']:
+        executor.mouse_commands.click_button(args[0])
+    elif cmd == 'click':
+        x, y, btn = args
+        executor.mouse_commands.click_at(x, y, btn)
+    elif cmd == 'move':
+        x, y = args
+        executor.mouse_commands.move(x, y)
+    elif cmd == 'drag':
+        x1, y1, x2, y2 = args
+        executor.mouse_commands.drag(x1, y1, x2, y2)
+    elif cmd == 'scroll':
+        direction, amount = args
+        executor.mouse_commands.scroll(direction, amount)
+    elif cmd == 'on':
+        executor.mouse_commands.button_down(args[0])
+    elif cmd == 'off':
+        executor.mouse_commands.button_up(args[0])
+    elif cmd == 'wait':
+        executor.ctrl_commands.wait(args[0], speed)
+    elif cmd == 'echo':
+        executor.ctrl_commands.echo(args[0], log_callback)
+    elif cmd == 'input' or cmd == 'input_var':
+        executor._input(args, speed, log_callback)
+    elif log_callback:
+        log_callback(f"[UNKNOWN CMD] {cmd}")
+
+
+def registry_dispatch(executor, cmd, args, speed, log_callback):
+    """
+    The registry lookup of MacroExecutor._execute_actions
+
+    Args:
+        executor: MacroExecutor
+        cmd: Opcode
+        args: Decoded arguments
+        speed: Speed multiplier
+        log_callback: Logging callback
+    """
+    handler = executor.registry.get(cmd)
+    if handler is None:
+        if log_callback:
+            log_callback(f"[UNKNOWN CMD] {cmd}")
+    else:
+        handler(args, speed, log_callback)
+
+
+def make_executor():
+    """
+    Build an executor on a FakeBackend and a VirtualClock
+
+    Returns:
+        MacroExecutor instance
+    """
+    clock = VirtualClock()
+    context = ExecutionContext(input_backend=FakeBackend(clock=clock))
+    return MacroExecutor(context, clock=clock)
+
+
+def stub_commands(executor):
+    """Replace the command bodies with no-ops, leaving only the dispatch"""
+    def noop(*args):
+        pass
+
+    for commands in (executor.kb_commands, executor.mouse_commands, executor.ctrl_commands):
+        for name in ('press', 'hotkey', 'type_text', 'click_button', 'click_at', 'move',
+                     'drag', 'scroll', 'button_down', 'button_up', 'wait', 'echo'):
+            if hasattr(commands, name):
+                setattr(commands, name, noop)
+
+
+def ns_per_call(stmt, count, repeat):
+    """
+    Time a callable
+
+    Args:
+        stmt: Callable to time
+        count: Calls per measurement
+        repeat: Measurements (the best one is kept)
+
+    Returns:
+        Nanoseconds per call
+    """
+    return min(timeit.repeat(stmt, number=count, repeat=repeat)) / count * 1e9
+
+
+def bench_dispatch(count, repeat):
+    """Print the dispatch cost of each command, chain against registry"""
+    executor = make_executor()
+    stub_commands(executor)
+
+    def log(message):
+        pass
+
+    print("Dispatch only (no-op command bodies), ns per command")
+    print(f"  {'command':<10}{'chain':>8}{'registry':>10}")
+    for name, line in SAMPLES:
+        instruction = compile_line(line)
+        cmd, args = instruction.opcode, instruction.args
+        chain = ns_per_call(lambda: chain_dispatch(executor, cmd, args, 1.0, log), count, repeat)
+        table = ns_per_call(lambda: registry_dispatch(executor, cmd, args, 1.0, log), count, repeat)
+        print(f"  {name:<10}{chain:>8.0f}{table:>10.0f}")
+
+
+def bench_execute(count, repeat):
+    """Print the execution-loop cost per compiled instruction"""
+    executor = make_executor()
+
+    print("\nMacroExecutor.execute on FakeBackend, ns per instruction")
+    for name, line in SAMPLES:
+        actions = [compile_line(line, num) for num in range(1, count + 1)]
+        per_instruction = ns_per_call(lambda: executor.execute(actions, 1.0), 1, repeat) / count
+        print(f"  {name:<10}{per_instruction:>8.0f}")
+
+
+def main(argv=None):
+    """
+    Command-line entry point
+
+    Args:
+        argv: Argument list (default: sys.argv[1:])
+    """
+    arg_parser = argparse.ArgumentParser(prog='python -m benchmarks.dispatch',
+                                         description="Measure command dispatch cost")
+    arg_parser.add_argument('--count', type=int, default=40000,
+                            help="Commands per measurement")
+    arg_parser.add_argument('--repeat', type=int, default=5,
+                            help="Measurements per command (the best is kept)")
+    args = arg_parser.parse_args(argv)
+
+    bench_dispatch(args.count, args.repeat)
+    bench_execute(args.count, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
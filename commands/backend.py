@@ -0,0 +1,227 @@
+"""
+Input Backend Module
+Sends keyboard and mouse events to the system (pynput) or records them (fake)
+Keys and buttons are passed by name; only the backend knows the native objects
+"""
+import time
+from abc import ABC, abstractmethod
+
+# Mouse button names understood by every backend
+BUTTONS = ('left', 'right', 'middle')
+
+
+class InputBackend(ABC):
+    """Interface of the devices the macro commands drive"""
+
+    @abstractmethod
+    def press_key(self, key):
+        """
+        Press a key
+
+        Args:
+            key: Key name (e.g. 'ctrl', 'enter') or character
+        """
+
+    @abstractmethod
+    def release_key(self, key):
+        """
+        Release a key
+
+        Args:
+            key: Key name or character
+        """
+
+    @abstractmethod
+    def move(self, x, y):
+        """
+        Move the pointer
+
+        Args:
+            x: X coordinate
+            y: Y coordinate
+        """
+
+    @abstractmethod
+    def press_button(self, button):
+        """
+        Press a mouse button
+
+        Args:
+            button: 'left', 'right' or 'middle'
+        """
+
+    @abstractmethod
+    def release_button(self, button):
+        """
+        Release a mouse button
+
+        Args:
+            button: 'left', 'right' or 'middle'
+        """
+
+    @abstractmethod
+    def scroll(self, dx, dy):
+        """
+        Scroll the mouse wheel
+
+        Args:
+            dx: Horizontal units
+            dy: Vertical units (positive scrolls up)
+        """
+
+    @abstractmethod
+    def get_position(self):
+        """
+        Get the pointer position
+
+        Returns:
+            Tuple of (x, y)
+        """
+
+    @abstractmethod
+    def get_screen_size(self):
+        """
+        Get the screen size
+
+        Returns:
+            Tuple of (width, height)
+        """
+
+
+class PynputBackend(InputBackend):
+    """Real keyboard and mouse through pynput"""
+
+    def __init__(self):
+        """Create the pynput controllers (pynput is only imported here)"""
+        from pynput.keyboard import Controller as KController, Key
+        from pynput.mouse import Controller as MController, Button
+
+        self._key_enum = Key
+        self._keys = {}                   # Name -> pynput key, filled on use
+        self._buttons = {name: getattr(Button, name) for name in BUTTONS}
+        self.keyboard = KController()
+        self.mouse = MController()
+
+    def _key(self, key):
+        """Resolve a key name into a pynput Key (characters stay as they are)"""
+        native = self._keys.get(key)
+        if native is None:
+            native = self._keys[key] = getattr(self._key_enum, key, key)
+        return native
+
+    def press_key(self, key):
+        self.keyboard.press(self._key(key))
+
+    def release_key(self, key):
+        self.keyboard.release(self._key(key))
+
+    def move(self, x, y):
+        self.mouse.position = (x, y)
+
+    def press_button(self, button):
+        self.mouse.press(self._buttons[button])
+
+    def release_button(self, button):
+        self.mouse.release(self._buttons[button])
+
+    def scroll(self, dx, dy):
+        self.mouse.scroll(dx, dy)
+
+    def get_position(self):
+        return self.mouse.position
+
+    def get_screen_size(self):
+        from utils.screen import ScreenGeometry
+        return ScreenGeometry.get_size()
+
+
+class FakeBackend(InputBackend):
+    """In-memory backend recording every event with its timestamp"""
+
+    def __init__(self, clock=None, screen_size=(1920, 1080), position=(0, 0)):
+        """
+        Initialize fake backend
+
+        Args:
+            clock: Callable returning the current time in seconds
+                (default: time.perf_counter); pass a virtual clock to get
+                simulated timestamps
+            screen_size: Tuple of (width, height) reported to the engine
+            position: Initial pointer position
+        """
+        self.clock = clock or time.perf_counter
+        self.screen_size = screen_size
+        self.position = position
+        self.keys_down = set()
+        self.buttons_down = set()
+        self.events = []                  # (time, event, args) tuples
+        self.start = self.clock()
+
+    def reset(self):
+        """Forget the recorded events and restart timestamps from zero"""
+        self.events = []
+        self.keys_down.clear()
+        self.buttons_down.clear()
+        self.start = self.clock()
+
+    def _record(self, event, *args):
+        """Append an event, timestamped relative to the start"""
+        self.events.append((self.clock() - self.start, event, args))
+
+    def press_key(self, key):
+        self.keys_down.add(key)
+        self._record('key_down', key)
+
+    def release_key(self, key):
+        self.keys_down.discard(key)
+        self._record('key_up', key)
+
+    def move(self, x, y):
+        self.position = (x, y)
+        self._record('move', x, y)
+
+    def press_button(self, button):
+        self.buttons_down.add(button)
+        self._record('button_down', button)
+
+    def release_button(self, button):
+        self.buttons_down.discard(button)
+        self._record('button_up', button)
+
+    def scroll(self, dx, dy):
+        self._record('scroll', dx, dy)
+
+    def get_position(self):
+        return self.position
+
+    def get_screen_size(self):
+        return self.screen_size
+
+    def format_events(self, start=0):
+        """
+        Format the recorded events, one line per event
+
+        Args:
+            start: Index of the first event to format
+
+        Returns:
+            List of strings such as '    1.250s  key_down ctrl'
+        """
+        return [f"{t:9.3f}s  {event} {' '.join(str(a) for a in args)}".rstrip()
+                for t, event, args in self.events[start:]]
+
+
+_default_backend = None
+
+
+def default_backend():
+    """
+    Get the process-wide pynput backend, created on first use
+
+    Returns:
+        PynputBackend instance
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = PynputBackend()
+    return _default_backend
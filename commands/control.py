@@ -2,15 +2,21 @@
 Control Commands Module
 Handles control flow and utility commands
 """
-import time
+from utils.timing import PrecisionScheduler
 
 
 class ControlCommands:
     """Executes control commands"""
 
-    def __init__(self):
-        """Initialize control commands"""
-        pass
+    def __init__(self, scheduler=None):
+        """
+        Initialize control commands
+
+        Args:
+            scheduler: PrecisionScheduler timing the waits (shared with the
+                other command modules to keep one timeline)
+        """
+        self.scheduler = scheduler or PrecisionScheduler()
 
     def wait(self, seconds, speed=1.0):
         """
@@ -21,7 +27,7 @@ class ControlCommands:
             speed: Speed multiplier
         """
         actual_duration = seconds / speed
-        time.sleep(actual_duration)
+        self.scheduler.wait(actual_duration)
 
     def echo(self, message, log_callback=None):
         """
@@ -33,3 +39,13 @@ class ControlCommands:
         """
         if log_callback:
             log_callback(f"[ECHO] {message}")
+
+    def register_commands(self, registry):
+        """
+        Register the control commands
+
+        Args:
+            registry: CommandRegistry instance
+        """
+        registry.register('wait', lambda args, speed, log: self.wait(args[0], speed))
+        registry.register('echo', lambda args, speed, log: self.echo(args[0], log))
@@ -2,23 +2,45 @@
 Keyboard Commands Module
 Handles all keyboard-related macro commands
 """
-from pynput.keyboard import Controller as KController, Key
-import time
+from commands.backend import default_backend
+from utils.timing import PrecisionScheduler
 
 
 class KeyboardCommands:
     """Executes keyboard commands"""
 
-    def __init__(self):
-        """Initialize keyboard controller"""
-        self.controller = KController()
+    def __init__(self, scheduler=None, backend=None):
+        """
+        Initialize keyboard commands
+
+        Args:
+            scheduler: PrecisionScheduler timing holds and typing delays
+            backend: InputBackend receiving the key events
+                (default: the shared pynput backend)
+        """
+        self.backend = backend or default_backend()
+        self.scheduler = scheduler or PrecisionScheduler()
+
+    @staticmethod
+    def parse_keys(keys_str):
+        """
+        Split a key combination string into key names
+
+        Args:
+            keys_str: Key or key combination (e.g., 'a' or 'ctrl+c')
+
+        Returns:
+            Tuple of key names or characters (resolved by the backend)
+        """
+        return tuple(k.strip() for k in keys_str.split('+'))
 
     def press(self, keys_str, duration, speed=1.0):
         """
         Press key(s) for a duration
 
         Args:
-            keys_str: Key or key combination (e.g., 'a' or 'ctrl+c')
+            keys_str: Key or key combination (e.g., 'a' or 'ctrl+c'),
+                or keys already resolved with parse_keys()
             duration: Duration to hold in seconds
             speed: Speed multiplier
         """
@@ -26,45 +48,37 @@ class KeyboardCommands:
         actual_duration = duration / speed
 
         # Parse keys (support combinations like ctrl+c)
-        keys = []
-        for k in keys_str.split('+'):
-            k = k.strip()
-            # Try to get special key from Key enum, otherwise use character
-            key = getattr(Key, k, k)
-            keys.append(key)
+        keys = self.parse_keys(keys_str) if isinstance(keys_str, str) else keys_str
 
         # Press all keys
         for k in keys:
-            self.controller.press(k)
+            self.backend.press_key(k)
 
         # Hold
-        time.sleep(actual_duration)
+        self.scheduler.wait(actual_duration)
 
         # Release in reverse order
         for k in reversed(keys):
-            self.controller.release(k)
+            self.backend.release_key(k)
 
     def hotkey(self, keys_str):
         """
         Execute a keyboard shortcut (press and release immediately)
 
         Args:
-            keys_str: Key combination (e.g., 'alt+tab')
+            keys_str: Key combination (e.g., 'alt+tab'),
+                or keys already resolved with parse_keys()
         """
         # Parse keys
-        keys = []
-        for k in keys_str.split('+'):
-            k = k.strip()
-            key = getattr(Key, k, k)
-            keys.append(key)
+        keys = self.parse_keys(keys_str) if isinstance(keys_str, str) else keys_str
 
         # Press all
         for k in keys:
-            self.controller.press(k)
+            self.backend.press_key(k)
 
         # Release all in reverse order
         for k in reversed(keys):
-            self.controller.release(k)
+            self.backend.release_key(k)
 
     def type_text(self, text, speed=1.0):
         """
@@ -77,6 +91,19 @@ class KeyboardCommands:
         delay = 0.03 / speed
 
         for char in text:
-            self.controller.press(char)
-            self.controller.release(char)
-            time.sleep(delay)
+            self.backend.press_key(char)
+            self.backend.release_key(char)
+            if not self.scheduler.wait(delay):
+                # Macro stopped: do not type the rest
+                break
+
+    def register_commands(self, registry):
+        """
+        Register the keyboard commands
+
+        Args:
+            registry: CommandRegistry instance
+        """
+        registry.register('press', lambda args, speed, log: self.press(args[0], args[1], speed))
+        registry.register('hotkey', lambda args, speed, log: self.hotkey(args[0]))
+        registry.register('type', lambda args, speed, log: self.type_text(args[0], speed))
@@ -2,32 +2,70 @@
 Mouse Commands Module
 Handles all mouse-related macro commands
 """
-from pynput.mouse import Controller as MController, Button
-import time
+from commands.backend import default_backend
+from utils.timing import PrecisionScheduler
+
+
+# Button names accepted by click commands
+BUTTON_MAP = {
+    'lmc': 'left',
+    'rmc': 'right',
+    'mmc': 'middle',
+    'left': 'left',
+    'right': 'right',
+    'middle': 'middle'
+}
 
 
 class MouseCommands:
     """Executes mouse commands"""
 
-    def __init__(self):
-        """Initialize mouse controller"""
-        self.controller = MController()
+    def __init__(self, scheduler=None, backend=None):
+        """
+        Initialize mouse commands
+
+        Args:
+            scheduler: PrecisionScheduler timing clicks and drags
+            backend: InputBackend receiving the pointer events
+                (default: the shared pynput backend)
+        """
+        self.backend = backend or default_backend()
+        self.scheduler = scheduler or PrecisionScheduler()
+
+    @staticmethod
+    def resolve_button(button_name):
+        """
+        Resolve a button name into a backend button
+
+        Args:
+            button_name: 'lmc', 'rmc', 'mmc', 'left', 'right' or 'middle'
+
+        Returns:
+            'left', 'right' or 'middle' (left if the name is unknown)
+        """
+        return BUTTON_MAP.get(button_name, 'left')
+
+    @staticmethod
+    def resolve_hold_button(button_name):
+        """
+        Resolve a button name for on/off commands
+
+        Args:
+            button_name: 'lmc', 'left', 'rmc' or 'right'
+
+        Returns:
+            'right' unless the name designates the left button
+        """
+        return 'left' if button_name in ['lmc', 'left'] else 'right'
 
     def click_button(self, button_name):
         """
         Click a mouse button at current position
 
         Args:
-            button_name: 'lmc', 'rmc', or 'mmc'
+            button_name: 'lmc', 'rmc', 'mmc' or a resolved button
         """
-        button_map = {
-            'lmc': Button.left,
-            'rmc': Button.right,
-            'mmc': Button.middle
-        }
-
-        button = button_map.get(button_name, Button.left)
-        self._click(button)
+        self._click(self.resolve_button(button_name))
 
     def click_at(self, x, y, button_name='left'):
         """
@@ -36,20 +74,12 @@ class MouseCommands:
         Args:
             x: X coordinate
             y: Y coordinate
-            button_name: 'left', 'right', or 'middle'
+            button_name: 'left', 'right', 'middle' or a resolved button
         """
         # Move to position
-        self.controller.position = (x, y)
+        self.backend.move(x, y)
 
-        # Map button name
-        button_map = {
-            'left': Button.left,
-            'right': Button.right,
-            'middle': Button.middle
-        }
-
-        button = button_map.get(button_name, Button.left)
-        self._click(button)
+        self._click(self.resolve_button(button_name))
 
     def move(self, x, y):
         """
@@ -59,7 +89,7 @@ class MouseCommands:
             x: X coordinate
             y: Y coordinate
         """
-        self.controller.position = (x, y)
+        self.backend.move(x, y)
 
     def drag(self, x1, y1, x2, y2):
         """
@@ -72,12 +102,12 @@ class MouseCommands:
             y2: End Y coordinate
         """
         # Move to start position
-        self.controller.position = (x1, y1)
-        time.sleep(0.05)
+        self.backend.move(x1, y1)
+        self.scheduler.wait(0.05)
 
         # Press left button
-        self.controller.press(Button.left)
-        time.sleep(0.05)
+        self.backend.press_button('left')
+        self.scheduler.wait(0.05)
 
         # Smooth dragging with interpolation
         steps = 10
@@ -85,12 +115,12 @@ class MouseCommands:
             t = i / steps
             x = int(x1 + (x2 - x1) * t)
             y = int(y1 + (y2 - y1) * t)
-            self.controller.position = (x, y)
-            time.sleep(0.01)
+            self.backend.move(x, y)
+            self.scheduler.wait(0.01)
 
         # Release button
-        self.controller.release(Button.left)
-        time.sleep(0.05)
+        self.backend.release_button('left')
+        self.scheduler.wait(0.05)
 
     def scroll(self, direction, amount):
         """
@@ -101,27 +131,41 @@ class MouseCommands:
             amount: Number of scroll units
         """
         scroll_amount = amount if direction == 'up' else -amount
-        self.controller.scroll(0, scroll_amount)
+        self.backend.scroll(0, scroll_amount)
 
     def button_down(self, button_name):
         """
         Press and hold a mouse button
 
         Args:
-            button_name: 'lmc', 'left', 'rmc', 'right'
+            button_name: 'lmc', 'left', 'rmc', 'right' or a resolved button
         """
-        button = Button.left if button_name in ['lmc', 'left'] else Button.right
-        self.controller.press(button)
+        self.backend.press_button(self.resolve_hold_button(button_name))
 
     def button_up(self, button_name):
         """
         Release a mouse button
 
         Args:
-            button_name: 'lmc', 'left', 'rmc', 'right'
+            button_name: 'lmc', 'left', 'rmc', 'right' or a resolved button
+        """
+        self.backend.release_button(self.resolve_hold_button(button_name))
+
+    def register_commands(self, registry):
+        """
+        Register the mouse commands
+
+        Args:
+            registry: CommandRegistry instance
         """
-        button = Button.left if button_name in ['lmc', 'left'] else Button.right
-        self.controller.release(button)
+        for opcode in ('lmc', 'rmc', 'mmc'):
+            registry.register(opcode, lambda args, speed, log: self.click_button(args[0]))
+        registry.register('click', lambda args, speed, log: self.click_at(*args))
+        registry.register('move', lambda args, speed, log: self.move(*args))
+        registry.register('drag', lambda args, speed, log: self.drag(*args))
+        registry.register('scroll', lambda args, speed, log: self.scroll(*args))
+        registry.register('on', lambda args, speed, log: self.button_down(args[0]))
+        registry.register('off', lambda args, speed, log: self.button_up(args[0]))
 
     def get_position(self):
         """
@@ -130,10 +174,10 @@ class MouseCommands:
         Returns:
             Tuple of (x, y) coordinates
         """
-        return self.controller.position
+        return self.backend.get_position()
 
     def _click(self, button):
         """Internal helper to perform a click"""
-        self.controller.press(button)
-        time.sleep(0.05)
-        self.controller.release(button)
+        self.backend.press_button(button)
+        self.scheduler.wait(0.05)
+        self.backend.release_button(button)
@@ -0,0 +1,63 @@
+"""
+Command Registry Module
+Maps command names (opcodes) to the callables that execute them
+"""
+
+
+class CommandRegistry:
+    """Table of command handlers used by the executor"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._handlers = {}
+
+    def register(self, opcode, handler):
+        """
+        Register (or replace) a command handler
+
+        Handlers are called as handler(args, speed, log_callback), where
+        args is the tuple built by the command's decoder (see
+        engine.compiler.DECODERS). Commands without a decoder, such as
+        custom ones, receive the raw comma-separated arguments as strings.
+
+        Args:
+            opcode: Command name, case-insensitive (e.g. 'beep')
+            handler: Callable executing the command
+        """
+        self._handlers[opcode.lower()] = handler
+
+    def unregister(self, opcode):
+        """
+        Remove a command handler
+
+        Args:
+            opcode: Command name
+        """
+        self._handlers.pop(opcode.lower(), None)
+
+    def get(self, opcode):
+        """
+        Get the handler of a command
+
+        Args:
+            opcode: Lowercase command name
+
+        Returns:
+            Handler callable or None if the command is unknown
+        """
+        return self._handlers.get(opcode)
+
+    def opcodes(self):
+        """
+        Get the registered command names
+
+        Returns:
+            Sorted list of opcodes
+        """
+        return sorted(self._handlers)
+
+    def __contains__(self, opcode):
+        return opcode in self._handlers
+
+    def __len__(self):
+        return len(self._handlers)
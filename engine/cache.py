@@ -0,0 +1,475 @@
+"""
+Parse Cache Module
+Reuses action trees of scripts that were already parsed
+In memory (ParseCache) and on disk as compiled .mbc files (CompiledFileCache)
+"""
+import hashlib
+import json
+import os
+from array import array
+from collections import OrderedDict
+from engine.compact import (COMPACT_OPCODES, COMPACT_THRESHOLD, CompactRun, StringTable,
+                            pack_actions)
+from engine.compiler import Instruction
+from engine.template import VariableTemplate
+from utils.file_io import FileManager
+
+# Compiled macro file format: magic header, then a JSON document holding
+# only data (no code is ever loaded from a .mbc file)
+MBC_MAGIC = b'MBC2'
+MBC_VERSION = 6
+CACHE_DIR_NAME = '__macrocache__'
+
+# Column types of a CompactRun, in storage order
+RUN_COLUMNS = (('opcodes', 'B'), ('xs', 'i'), ('ys', 'i'),
+               ('durations', 'd'), ('texts', 'i'), ('lines', 'i'))
+
+
+class ParseCache:
+    """LRU cache of parsed (and optionally compiled) scripts"""
+
+    def __init__(self, maxsize=16, compiler=None, optimizer=None, compact=False):
+        """
+        Initialize parse cache
+
+        Args:
+            maxsize: Maximum number of cached scripts
+            compiler: Optional MacroCompiler; cached trees are then compiled
+            optimizer: Optional MacroOptimizer run on compiled trees
+            compact: Pack long runs of simple commands into typed arrays
+                (see engine.compact) in scripts of COMPACT_THRESHOLD lines
+                or more; requires a compiler
+        """
+        self.maxsize = maxsize
+        self.compiler = compiler
+        self.optimizer = optimizer
+        self.compact = compact
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (actions, functions, variables)
+
+    def build_options(self):
+        """
+        Describe how this cache builds its trees
+
+        Trees built with other options have another shape (uncompiled,
+        unoptimized or unpacked), so .mbc files record these options.
+
+        Returns:
+            Dict of JSON-compatible option values
+        """
+        return {
+            'compiled': self.compiler is not None,
+            'optimized': self.compiler is not None and self.optimizer is not None,
+            'compact': bool(self.compiler is not None and self.compact),
+            'compact_threshold': COMPACT_THRESHOLD
+        }
+
+    @staticmethod
+    def make_key(script, context):
+        """
+        Build the cache key of a script
+
+        The parser evaluates assignments against the variables already in
+        the context and only resolves calls to known functions, so both
+        are part of the key. A pure parse depends on the text alone.
+
+        Args:
+            script: Script text
+            context: ExecutionContext the script will be parsed into,
+                or None for a pure parser
+
+        Returns:
+            Hex digest string
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(script.encode('utf-8'))
+        if context is None:
+            return digest.hexdigest()
+        prelude = sorted((name, repr(value)) for name, value in context.variables.items())
+        digest.update(repr(prelude).encode('utf-8'))
+        digest.update(repr(sorted(context.functions)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def parse(self, parser, script):
+        """
+        Parse a script, reusing a cached tree when possible
+
+        On a hit the variables and functions the script defines are
+        installed into the parser's context, as a real parse would do.
+        For a pure parser the functions are installed into its context
+        if it has one, so the result can be executed right away.
+
+        Args:
+            parser: ScriptParser instance
+            script: Script text
+
+        Returns:
+            Tuple of (actions, functions)
+
+        Raises:
+            SyntaxError: If the script is invalid (errors are not cached)
+        """
+        context = parser.context
+        key = self.key_for(parser, script)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry = self._build(parser, script)
+            self.put(key, entry)
+
+        actions, functions, variables = entry
+        if context is not None:
+            context.variables.update(variables)
+            context.functions.update(functions)
+        return actions, functions
+
+    def key_for(self, parser, script):
+        """
+        Build the cache key of a script for a given parser
+
+        Args:
+            parser: ScriptParser instance
+            script: Script text
+
+        Returns:
+            Hex digest string
+        """
+        return self.make_key(script, None if parser.pure else parser.context)
+
+    def get(self, key):
+        """
+        Get an entry without touching the counters
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Tuple of (actions, functions, variables) or None
+        """
+        return self._entries.get(key)
+
+    def put(self, key, entry):
+        """
+        Store an entry, evicting the least recently used one if full
+
+        Args:
+            key: Key from make_key()
+            entry: Tuple of (actions, functions, variables)
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _build(self, parser, script):
+        """
+        Parse a script and snapshot what it defined
+
+        Args:
+            parser: ScriptParser instance
+            script: Script text
+
+        Returns:
+            Tuple of (actions, functions, variables)
+        """
+        actions = parser.parse(script)
+        functions = dict(parser.functions)
+
+        variables = {} if parser.pure else dict(parser.context.variables)
+
+        if self.compiler:
+            actions = self.compiler.compile(actions, functions)
+            if self.optimizer:
+                actions = self.optimizer.optimize(actions, functions, variables)
+            if self.compact and script.count('\n') + 1 >= COMPACT_THRESHOLD:
+                actions = pack_actions(actions, functions)
+
+        return actions, functions, variables
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+            Dict with hits, misses and current size
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CompiledFileCache:
+    """Persistent cache of compiled macro files (.mbc)"""
+
+    def __init__(self, parse_cache, cache_dir=None):
+        """
+        Initialize compiled file cache
+
+        Args:
+            parse_cache: ParseCache that builds trees and receives loaded ones
+            cache_dir: Directory for .mbc files (default: __macrocache__
+                next to each macro file)
+        """
+        self.parse_cache = parse_cache
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def cache_path(self, filepath):
+        """
+        Get the .mbc path of a macro file
+
+        Args:
+            filepath: Path to the macro file
+
+        Returns:
+            Path to the compiled cache file
+        """
+        filepath = os.path.abspath(filepath)
+        directory = self.cache_dir or os.path.join(os.path.dirname(filepath), CACHE_DIR_NAME)
+        name = os.path.basename(filepath)
+        if self.cache_dir:
+            # Shared directory: disambiguate files with the same name
+            name += '-' + hashlib.blake2b(filepath.encode('utf-8'), digest_size=8).hexdigest()
+        return os.path.join(directory, name + '.mbc')
+
+    def load_file(self, filepath, parser):
+        """
+        Load a macro file and make its action tree available
+
+        The tree is read from the .mbc file when path, mtime, content hash
+        and build options (see ParseCache.build_options) still match,
+        otherwise the script is parsed and the .mbc file
+        is rewritten. Either way the tree ends up in the parse cache, so
+        running the script right after loading it does not parse it.
+
+        Args:
+            filepath: Path to the macro file
+            parser: Pure ScriptParser, or one with a fresh context
+
+        Returns:
+            Tuple of (script_content, speed, iterations, metadata),
+            like FileManager.load_file()
+        """
+        script, speed, iterations, metadata = FileManager.load_file(filepath)
+        key = self.parse_cache.key_for(parser, script)
+        stat = os.stat(filepath)
+
+        entry = self._read(filepath, stat, key)
+        if entry is not None:
+            self.hits += 1
+            self.parse_cache.put(key, entry)
+            return script, speed, iterations, metadata
+
+        self.misses += 1
+        try:
+            self.parse_cache.parse(parser, script)
+        except SyntaxError:
+            # Invalid scripts still load into the editor, they just aren't cached
+            return script, speed, iterations, metadata
+
+        self._write(filepath, stat, key, self.parse_cache.get(key))
+        return script, speed, iterations, metadata
+
+    def _read(self, filepath, stat, key):
+        """
+        Read a compiled entry if it is still up to date
+
+        Args:
+            filepath: Path to the macro file
+            stat: os.stat_result of the macro file
+            key: Content key from ParseCache.make_key()
+
+        Returns:
+            Tuple of (actions, functions, variables) or None
+        """
+        try:
+            with open(self.cache_path(filepath), 'rb') as f:
+                if f.read(len(MBC_MAGIC)) != MBC_MAGIC:
+                    return None
+                header = json.loads(f.readline().decode('utf-8'))
+
+                if (not isinstance(header, dict) or
+                        header.get('version') != MBC_VERSION or
+                        header.get('source') != os.path.abspath(filepath) or
+                        header.get('mtime_ns') != stat.st_mtime_ns or
+                        header.get('key') != key or
+                        header.get('options') != self.parse_cache.build_options()):
+                    return None
+
+                return decode_entry(header, f.read())
+        except Exception:
+            # Unreadable, malformed or hand-crafted files are misses
+            return None
+
+    def _write(self, filepath, stat, key, entry):
+        """
+        Write a compiled entry (errors are ignored, the cache is optional)
+
+        Args:
+            filepath: Path to the macro file
+            stat: os.stat_result of the macro file
+            key: Content key from ParseCache.make_key()
+            entry: Tuple of (actions, functions, variables)
+        """
+        if entry is None:
+            return
+
+        path = self.cache_path(filepath)
+        try:
+            tables, body = encode_entry(entry)
+            header = {
+                'version': MBC_VERSION,
+                'source': os.path.abspath(filepath),
+                'mtime_ns': stat.st_mtime_ns,
+                'key': key,
+                'options': self.parse_cache.build_options()
+            }
+            header.update(tables)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(MBC_MAGIC)
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                f.write(json.dumps(body, separators=(',', ':')).encode('utf-8'))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError, RecursionError):
+            pass
+
+
+def encode_entry(entry):
+    """
+    Convert a cache entry into JSON-compatible data
+
+    Lists stay lists; tuples, instructions, packed runs and linked calls
+    become one-key objects ({'t': ...}, {'i': ...}, {'c': ...}, {'f': ...}),
+    the only objects in the body. Linked calls keep the function name and
+    are linked again on load, so recursive functions need no cycles.
+
+    Args:
+        entry: Tuple of (actions, functions, variables)
+
+    Returns:
+        Tuple of (tables, body): tables holds the function names and the
+        string tables of packed runs (stored in the header), body is
+        [actions, [[name, body], ...], [[name, value], ...]]
+
+    Raises:
+        TypeError: If the tree holds a value that cannot be stored
+    """
+    actions, functions, variables = entry
+    table_index = {}                  # id(StringTable) -> index
+    strings = []
+
+    def encode(value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, list):
+            return [encode(v) for v in value]
+        if isinstance(value, tuple):
+            if len(value) == 4 and value[0] == 'CALL_FUNCTION':
+                return {'f': [value[1], value[3]]}
+            return {'t': [encode(v) for v in value]}
+        if isinstance(value, Instruction):
+            return {'i': [value.opcode, encode(value.args), list(value.slots),
+                          value.source, value.line_num]}
+        if isinstance(value, CompactRun):
+            table = table_index.get(id(value.strings))
+            if table is None:
+                table = table_index[id(value.strings)] = len(strings)
+                strings.append(list(value.strings.strings))
+            return {'c': [table] + [getattr(value, name).tolist() for name, _ in RUN_COLUMNS]}
+        raise TypeError(f"cannot store {type(value).__name__} in a .mbc file")
+
+    body = [encode(actions),
+            [[name, encode(fn_body)] for name, fn_body in functions.items()],
+            [[name, encode(value)] for name, value in variables.items()]]
+    return {'functions': list(functions), 'strings': strings}, body
+
+
+def decode_entry(tables, payload):
+    """
+    Rebuild a cache entry from encode_entry() output
+
+    The objects of the body are decoded while JSON parses it. Every field
+    is type-checked; anything unexpected raises ValueError.
+
+    Args:
+        tables: Dict with the 'functions' and 'strings' of the header
+        payload: Encoded body (bytes)
+
+    Returns:
+        Tuple of (actions, functions, variables)
+    """
+    string_tables = []
+    for table_strings in tables['strings']:
+        if not all(isinstance(text, str) for text in table_strings):
+            raise ValueError("invalid string table")
+        table = StringTable()
+        for text in table_strings:
+            table.intern(text)
+        string_tables.append(table)
+
+    # Bodies exist before they are filled so any call can link to them
+    functions = {}
+    for name in tables['functions']:
+        if not isinstance(name, str):
+            raise ValueError("invalid function name")
+        functions[name] = []
+
+    def decode(obj):
+        if len(obj) != 1:
+            raise ValueError("invalid object")
+        tag, fields = next(iter(obj.items()))
+        if not isinstance(fields, list):
+            raise ValueError("invalid object")
+        if tag == 't':
+            return tuple(fields)
+        if tag == 'f':
+            name, line_num = fields
+            body = functions.get(name)
+            if body is None:
+                return ('CALL_FUNCTION', name, line_num)
+            return ('CALL_FUNCTION', name, body, line_num)
+        if tag == 'i':
+            opcode, args, slots, source, line_num = fields
+            if not (isinstance(opcode, str) and isinstance(source, str) and
+                    all(isinstance(name, str) for name in slots)):
+                raise ValueError("invalid instruction")
+            template = VariableTemplate.parse(source) if slots else None
+            return Instruction(opcode, args, tuple(slots), source, line_num, template)
+        if tag == 'c':
+            table = string_tables[fields[0]]
+            run = CompactRun(table)
+            for (name, typecode), column in zip(RUN_COLUMNS, fields[1:]):
+                setattr(run, name, array(typecode, column))
+            size = len(run.opcodes)
+            if (any(len(getattr(run, name)) != size for name, _ in RUN_COLUMNS) or
+                    any(op >= len(COMPACT_OPCODES) for op in run.opcodes) or
+                    any(not -1 <= idx < len(table.strings) for idx in run.texts)):
+                raise ValueError("invalid packed run")
+            return run
+        raise ValueError(f"unknown tag {tag!r}")
+
+    actions, function_bodies, variables = json.loads(payload.decode('utf-8'), object_hook=decode)
+    for name, body in function_bodies:
+        functions[name].extend(body)
+    return actions, functions, dict(variables)
@@ -0,0 +1,257 @@
+"""
+Compact Storage Module
+Stores long straight-line runs of simple commands in typed arrays
+Used for big recordings, where one object per command costs too much memory
+"""
+from array import array
+from bisect import bisect_left
+from commands.keyboard import KeyboardCommands
+from commands.mouse import MouseCommands
+from engine.compiler import Instruction
+
+# Opcodes a run can hold (index = stored opcode number)
+COMPACT_OPCODES = ('move', 'click', 'wait', 'lmc', 'rmc', 'mmc',
+                   'on', 'off', 'scroll', 'press', 'hotkey', 'type')
+OPCODE_INDEX = {name: idx for idx, name in enumerate(COMPACT_OPCODES)}
+
+# Runs shorter than this stay as Instruction objects
+DEFAULT_MIN_RUN = 64
+
+# Scripts with fewer lines than this are not packed (see ParseCache)
+COMPACT_THRESHOLD = 20000
+
+
+class StringTable:
+    """Shared table of the string arguments of a tree (buttons, keys, text)"""
+
+    def __init__(self):
+        """Initialize string table"""
+        self.strings = []
+        self._index = {}
+
+    def intern(self, text):
+        """
+        Get the index of a string, adding it if needed
+
+        Args:
+            text: String to store
+
+        Returns:
+            Index in self.strings
+        """
+        idx = self._index.get(text)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(text)
+            self._index[text] = idx
+        return idx
+
+
+class CompactRun:
+    """
+    A run of simple commands stored column by column
+
+    Behaves like a read-only list of Instruction objects, built on access.
+    Sources are rebuilt in canonical form (e.g. 'move,10,20'), which is
+    what the log shows for these commands.
+    """
+
+    __slots__ = ('opcodes', 'xs', 'ys', 'durations', 'texts', 'lines', 'strings')
+
+    def __init__(self, strings):
+        """
+        Initialize an empty run
+
+        Args:
+            strings: StringTable shared by the runs of a tree
+        """
+        self.opcodes = array('B')       # Index in COMPACT_OPCODES
+        self.xs = array('i')            # x / scroll amount
+        self.ys = array('i')            # y
+        self.durations = array('d')     # wait / press duration
+        self.texts = array('i')         # Index in the string table, -1 if none
+        self.lines = array('i')         # Source line number, -1 if unknown
+        self.strings = strings
+
+    @staticmethod
+    def accepts(instruction):
+        """
+        Check whether an instruction can be stored in a run
+
+        Args:
+            instruction: Instruction object
+
+        Returns:
+            True for decoded commands without variables
+        """
+        return (instruction.opcode in OPCODE_INDEX and
+                instruction.args is not None and not instruction.slots)
+
+    def append(self, instruction):
+        """
+        Store an instruction (see accepts())
+
+        Args:
+            instruction: Instruction object
+        """
+        opcode = instruction.opcode
+        args = instruction.args
+        parts = [p.strip() for p in instruction.source.split(',')]
+        x = y = 0
+        duration = 0.0
+        text = None
+
+        if opcode == 'move':
+            x, y = args
+        elif opcode == 'click':
+            x, y = args[0], args[1]
+            text = parts[3] if len(parts) > 3 else 'left'
+        elif opcode == 'wait':
+            duration = args[0]
+        elif opcode in ('on', 'off', 'hotkey', 'type'):
+            text = parts[1]
+        elif opcode == 'scroll':
+            text, x = parts[1], args[1]
+        elif opcode == 'press':
+            text, duration = parts[1], args[1]
+
+        self.opcodes.append(OPCODE_INDEX[opcode])
+        self.xs.append(x)
+        self.ys.append(y)
+        self.durations.append(duration)
+        self.texts.append(-1 if text is None else self.strings.intern(text))
+        self.lines.append(-1 if instruction.line_num is None else instruction.line_num)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __getitem__(self, idx):
+        """
+        Build the instruction at an index
+
+        Args:
+            idx: Position in the run
+
+        Returns:
+            Instruction object
+        """
+        opcode = COMPACT_OPCODES[self.opcodes[idx]]
+        x, y = self.xs[idx], self.ys[idx]
+        duration = self.durations[idx]
+        text = self.strings.strings[self.texts[idx]] if self.texts[idx] >= 0 else None
+        line_num = self.lines[idx] if self.lines[idx] >= 0 else None
+
+        if opcode == 'move':
+            args, source = (x, y), f"move,{x},{y}"
+        elif opcode == 'click':
+            args, source = (x, y, MouseCommands.resolve_button(text)), f"click,{x},{y},{text}"
+        elif opcode == 'wait':
+            args, source = (duration,), f"wait,{duration:g}"
+        elif opcode in ('lmc', 'rmc', 'mmc'):
+            args, source = (MouseCommands.resolve_button(opcode),), opcode
+        elif opcode in ('on', 'off'):
+            args, source = (MouseCommands.resolve_hold_button(text),), f"{opcode},{text}"
+        elif opcode == 'scroll':
+            args, source = (text, x), f"scroll,{text},{x}"
+        elif opcode == 'press':
+            args, source = (KeyboardCommands.parse_keys(text), duration), f"press,{text},{duration:g}"
+        elif opcode == 'hotkey':
+            args, source = (KeyboardCommands.parse_keys(text),), f"hotkey,{text}"
+        else:
+            args, source = (text,), f"type,{text}"
+
+        return Instruction(opcode, args, (), source, line_num)
+
+    def __iter__(self):
+        for idx in range(len(self.opcodes)):
+            yield self[idx]
+
+    def find_line(self, line_num):
+        """
+        Find the command of a source line
+
+        Args:
+            line_num: Source line number
+
+        Returns:
+            Index in the run, or None if the line is not in it
+        """
+        idx = bisect_left(self.lines, line_num)
+        if idx < len(self.lines) and self.lines[idx] == line_num:
+            return idx
+        return None
+
+    def __repr__(self):
+        first = self.lines[0] if self.lines else None
+        last = self.lines[-1] if self.lines else None
+        return f"CompactRun({len(self)} commands, lines {first}-{last})"
+
+
+def pack_actions(actions, functions=None, min_run=DEFAULT_MIN_RUN, strings=None):
+    """
+    Replace long runs of simple instructions with CompactRun objects
+
+    Loop bodies are left as they are: a CompactRun builds an Instruction
+    on every access, which costs more than it saves in code that runs
+    many times.
+
+    Args:
+        actions: Compiled action tree
+        functions: Optional dict of compiled function bodies, packed in place
+        min_run: Minimum number of consecutive commands to pack
+        strings: StringTable to share (a new one by default)
+
+    Returns:
+        Packed action tree
+    """
+    strings = strings or StringTable()
+    for body in (functions or {}).values():
+        body[:] = _pack_block(body, min_run, strings)
+    return _pack_block(actions, min_run, strings)
+
+
+def _pack_block(actions, min_run, strings):
+    """
+    Pack a list of compiled actions recursively
+
+    Args:
+        actions: List of compiled actions
+        min_run: Minimum number of consecutive commands to pack
+        strings: Shared StringTable
+
+    Returns:
+        New list of actions
+    """
+    packed = []
+    pending = []
+
+    def flush():
+        if len(pending) >= min_run:
+            run = CompactRun(strings)
+            for instruction in pending:
+                run.append(instruction)
+            packed.append(run)
+        else:
+            packed.extend(pending)
+        pending.clear()
+
+    for action in actions:
+        if isinstance(action, Instruction) and CompactRun.accepts(action):
+            pending.append(action)
+            continue
+
+        flush()
+        if isinstance(action, (Instruction, CompactRun)):
+            packed.append(action)
+            continue
+
+        cmd_type = action[0]
+        if cmd_type == 'IF':
+            branches = [(cond, _pack_block(block, min_run, strings), line)
+                        for cond, block, line in action[1]]
+            packed.append(('IF', branches, action[2]))
+        else:
+            packed.append(action)
+
+    flush()
+    return packed
@@ -0,0 +1,251 @@
+"""
+Script Compiler Module
+Turns parsed action trees into pre-decoded instructions
+Splitting, number conversion and key/button resolution happen once, not per execution
+"""
+from commands.keyboard import KeyboardCommands
+from commands.mouse import MouseCommands
+from engine.template import VAR_REF_PATTERN, VariableTemplate
+
+
+class Instruction:
+    """A single command with its arguments already decoded"""
+
+    __slots__ = ('opcode', 'args', 'slots', 'source', 'line_num', 'template')
+
+    def __init__(self, opcode, args, slots, source, line_num, template=None):
+        """
+        Initialize instruction
+
+        Args:
+            opcode: Lowercase command name (e.g. 'click')
+            args: Tuple of decoded arguments, or None to decode at runtime
+            slots: Tuple of variable names that need runtime substitution
+            source: Original command line
+            line_num: Source line number
+            template: VariableTemplate of the source when there are slots
+        """
+        self.opcode = opcode
+        self.args = args
+        self.slots = slots
+        self.source = source
+        self.line_num = line_num
+        self.template = template
+
+    def __repr__(self):
+        return f"Instruction({self.opcode!r}, {self.args!r}, line={self.line_num})"
+
+
+def _decode_press(parts):
+    return (KeyboardCommands.parse_keys(parts[1]), float(parts[2]))
+
+
+def _decode_hotkey(parts):
+    return (KeyboardCommands.parse_keys(parts[1]),)
+
+
+def _decode_type(parts):
+    return (parts[1],)
+
+
+def _decode_button_click(parts):
+    return (MouseCommands.resolve_button(parts[0].lower()),)
+
+
+def _decode_click(parts):
+    btn = parts[3] if len(parts) > 3 else 'left'
+    return (int(parts[1]), int(parts[2]), MouseCommands.resolve_button(btn))
+
+
+def _decode_move(parts):
+    return (int(parts[1]), int(parts[2]))
+
+
+def _decode_drag(parts):
+    return (int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]))
+
+
+def _decode_scroll(parts):
+    return (parts[1], int(parts[2]))
+
+
+def _decode_hold(parts):
+    return (MouseCommands.resolve_hold_button(parts[1]),)
+
+
+def _decode_wait(parts):
+    return (float(parts[1]),)
+
+
+def _decode_echo(parts):
+    return (','.join(parts[1:]),)
+
+
+def _decode_input(parts):
+    # input,"prompt",$var
+    prompt = parts[1].strip('"')
+    var_name = parts[2] if len(parts) > 2 else None
+    return (prompt, var_name)
+
+
+def _decode_input_var(parts):
+    # input_var,$var,"prompt" (generated by the parser for $var = input,...)
+    var_name = parts[1].strip()
+    prompt = parts[2].strip().strip('"') if len(parts) > 2 else "Enter value"
+    return (prompt, var_name)
+
+
+# Opcode -> argument decoder
+DECODERS = {
+    'press': _decode_press,
+    'hotkey': _decode_hotkey,
+    'type': _decode_type,
+    'lmc': _decode_button_click,
+    'rmc': _decode_button_click,
+    'mmc': _decode_button_click,
+    'click': _decode_click,
+    'move': _decode_move,
+    'drag': _decode_drag,
+    'scroll': _decode_scroll,
+    'on': _decode_hold,
+    'off': _decode_hold,
+    'wait': _decode_wait,
+    'echo': _decode_echo,
+    'input': _decode_input,
+    'input_var': _decode_input_var
+}
+
+
+def decode_line(line):
+    """
+    Decode a command line into its opcode and arguments
+
+    Args:
+        line: Command line with variables already substituted
+
+    Returns:
+        Tuple of (opcode, args); commands without a decoder (custom
+        commands, see commands.registry) get their raw string arguments
+
+    Raises:
+        IndexError, ValueError: If the arguments are missing or malformed
+    """
+    parts = [p.strip() for p in line.split(',')]
+    opcode = parts[0].lower()
+    decoder = DECODERS.get(opcode)
+    if decoder is None:
+        return opcode, tuple(parts[1:])
+    return opcode, decoder(parts)
+
+
+def compile_line(line, line_num=None):
+    """
+    Compile a single command line into an Instruction
+
+    Lines referencing variables keep args=None and are decoded after
+    substitution at runtime. Lines whose arguments are malformed are also
+    left undecoded so the error is reported when they execute, as before.
+
+    Args:
+        line: Command line
+        line_num: Source line number
+
+    Returns:
+        Instruction instance
+    """
+    template = VariableTemplate.parse(line)
+    slots = template.names
+    opcode = line.split(',', 1)[0].strip().lower()
+    args = None
+
+    if not slots:
+        template = None
+        try:
+            opcode, args = decode_line(line)
+        except (IndexError, ValueError):
+            args = None
+
+    return Instruction(opcode, args, slots, line, line_num, template)
+
+
+class MacroCompiler:
+    """Compiles parsed action trees into instruction trees"""
+
+    def __init__(self):
+        """Initialize compiler"""
+        self._bodies = {}
+
+    def compile(self, actions, functions=None, linked=None):
+        """
+        Compile an action tree
+
+        Function bodies are compiled first and every call site is linked
+        to its compiled body: ('CALL_FUNCTION', name, body, line_num).
+        Calls to functions missing from the table keep the
+        ('CALL_FUNCTION', name, line_num) form and are looked up at runtime.
+
+        Args:
+            actions: Action tree from ScriptParser.parse()
+            functions: Optional dict of function bodies, compiled in place
+            linked: Optional dict of bodies compiled earlier that call
+                sites may also link to
+
+        Returns:
+            Action tree where every command is an Instruction
+        """
+        # Create the body lists first so recursive and forward calls can link
+        self._bodies = dict(linked or {})
+        self._bodies.update((name, []) for name in (functions or {}))
+        try:
+            for name, body in list((functions or {}).items()):
+                self._bodies[name].extend(self._compile_block(body))
+                functions[name] = self._bodies[name]
+
+            return self._compile_block(actions)
+        finally:
+            self._bodies = {}
+
+    def _compile_block(self, actions):
+        """
+        Compile a list of actions recursively
+
+        Args:
+            actions: List of parsed actions
+
+        Returns:
+            List of compiled actions
+        """
+        compiled = []
+
+        for action in actions:
+            if isinstance(action, Instruction):
+                compiled.append(action)
+                continue
+
+            cmd_type = action[0]
+
+            if cmd_type in ('LOOP', 'WHILE'):
+                _, arg, block, line_num = action
+                compiled.append((cmd_type, arg, self._compile_block(block), line_num))
+
+            elif cmd_type == 'IF':
+                branches = [(cond, self._compile_block(block), line)
+                            for cond, block, line in action[1]]
+                compiled.append(('IF', branches, action[2]))
+
+            elif cmd_type == 'CALL_FUNCTION' and len(action) == 3:
+                body = self._bodies.get(action[1])
+                if body is None:
+                    compiled.append(action)
+                else:
+                    compiled.append(('CALL_FUNCTION', action[1], body, action[2]))
+
+            elif cmd_type in ('BREAK', 'CONTINUE', 'BREAKPOINT', 'CALL_FUNCTION', 'ASSIGN'):
+                compiled.append(action)
+
+            else:
+                # Plain command: (line, line_num)
+                line, line_num = action
+                compiled.append(compile_line(line, line_num))
+
+        return compiled
@@ -2,22 +2,71 @@
 Execution Context Module
 Manages variables, functions, and system state during macro execution
 """
-import tkinter as tk
-from pynput.mouse import Controller as MController
+from collections.abc import Mapping
+from commands.backend import default_backend
+from engine.template import FRAME_SLOTS, MISSING, VariableTemplate
+
+
+class VariableScope(Mapping):
+    """Read-only view of every variable of a context, resolved on access"""
+
+    def __init__(self, context):
+        self._context = context
+
+    def __getitem__(self, name):
+        value = self._context.lookup_variable(name, self)
+        if value is self:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self._context.variable_exists(name)
+
+    def __iter__(self):
+        return iter(self._context.get_all_variables())
+
+    def __len__(self):
+        return len(self._context.get_all_variables())
+
+    def __bool__(self):
+        return True
 
 
 class ExecutionContext:
     """Manages all state during macro execution"""
 
-    def __init__(self):
-        """Initialize execution context"""
+    def __init__(self, cache_system_vars=True, input_backend=None):
+        """
+        Initialize execution context
+
+        Args:
+            cache_system_vars: Read each system variable at most once per
+                tick (see tick()) instead of on every reference
+            input_backend: InputBackend giving the mouse position and screen
+                size (default: the shared pynput backend, created on use)
+        """
         self.variables = {}           # User-defined variables ($name = value)
-        self.loop_vars = {}           # Loop counters ($i)
-        self.system_vars = {}         # System variables ($mouse_x, $mouse_y, etc.)
         self.special_vars = {}        # Special variables (@speed, @iterations)
         self.functions = {}           # Function definitions (name -> body)
-        self._screen_size = None      # Cached screen size
-        self._mouse_controller = MController()
+        self._input_backend = input_backend
+
+        # System variables ($mouse_x, $mouse_y, etc.) are read on demand
+        self.system_providers = {
+            '$mouse_x': lambda: int(self._mouse_position()[0]),
+            '$mouse_y': lambda: int(self._mouse_position()[1]),
+            '$screen_width': lambda: int(self.input_backend.get_screen_size()[0]),
+            '$screen_height': lambda: int(self.input_backend.get_screen_size()[1])
+        }
+        self.cache_system_vars = cache_system_vars
+        self.tick = 0                 # Bumped by the executor before each statement
+        self._tick_cache = {}         # key -> (tick, value)
+        self.scope = VariableScope(self)
+
+        # Scope frames (one per running loop or function call), each a list
+        # of values indexed by FRAME_SLOTS; frames are reused between calls
+        self._frames = []
+        self._depth = 0
+        self.frame = None             # Innermost frame, None at top level
 
     def set_variable(self, name, value):
         """Set a user variable"""
@@ -26,73 +75,124 @@ class ExecutionContext:
     def get_variable(self, name, default=None):
         """Get a variable value (checks all variable types)"""
         # Check in order: loop vars, special vars, user vars, system vars
-        if name in self.loop_vars:
-            return self.loop_vars[name]
+        value = self._frame_value(name)
+        if value is not MISSING:
+            return value
         if name in self.special_vars:
             return self.special_vars[name]
         if name in self.variables:
             return self.variables[name]
-        if name in self.system_vars:
-            return self.system_vars[name]
+        if name in self.system_providers:
+            return self._read_system_var(name)
         return default
 
     def variable_exists(self, name):
         """Check if a variable exists"""
         return (name in self.variables or
-                name in self.loop_vars or
-                name in self.system_vars or
+                self._frame_value(name) is not MISSING or
+                name in self.system_providers or
                 name in self.special_vars)
 
+    @property
+    def system_vars(self):
+        """Current values of all system variables (reads every provider)"""
+        return {name: self._read_system_var(name) for name in self.system_providers}
+
+    def register_system_var(self, name, provider):
+        """
+        Register a system variable
+
+        Args:
+            name: Variable name (e.g. '$clock')
+            provider: Callable returning the current value
+        """
+        self.system_providers[name] = provider
+
     def update_system_vars(self):
-        """Update system variables with current values"""
-        # Get mouse position
-        x, y = self._mouse_controller.position
-
-        # Get screen size (cache it)
-        if not self._screen_size:
-            try:
-                root = tk.Tk()
-                root.withdraw()
-                w = root.winfo_screenwidth()
-                h = root.winfo_screenheight()
-                root.destroy()
-                self._screen_size = (w, h)
-            except Exception:
-                self._screen_size = (0, 0)
-
-        w, h = self._screen_size
-
-        # Update system variables
-        self.system_vars = {
-            '$mouse_x': int(x),
-            '$mouse_y': int(y),
-            '$screen_width': int(w),
-            '$screen_height': int(h)
-        }
+        """Start a new tick: cached system variable values are read again"""
+        self.tick += 1
 
-    def replace_variables(self, text):
+    def _read_system_var(self, name):
         """
-        Replace all variables in text with their values
+        Read a system variable, at most once per tick when caching is on
 
         Args:
-            text: String containing variable references
+            name: Registered system variable name
 
         Returns:
-            String with variables replaced
+            Current value
         """
-        result = text
+        return self._cached(name, self.system_providers[name])
 
-        # Replace all variable types
-        all_vars = {}
-        all_vars.update(self.variables)
-        all_vars.update(self.loop_vars)
-        all_vars.update(self.system_vars)
-        all_vars.update(self.special_vars)
+    def _cached(self, key, read):
+        """
+        Get a value computed during the current tick, or compute it
+
+        Args:
+            key: Cache key
+            read: Callable computing the value
+
+        Returns:
+            Value
+        """
+        if not self.cache_system_vars:
+            return read()
+        entry = self._tick_cache.get(key)
+        if entry is not None and entry[0] == self.tick:
+            return entry[1]
+        value = read()
+        self._tick_cache[key] = (self.tick, value)
+        return value
+
+    @property
+    def input_backend(self):
+        """InputBackend the system variables are read from"""
+        if self._input_backend is None:
+            self._input_backend = default_backend()
+        return self._input_backend
 
-        for var_name, var_value in all_vars.items():
-            result = result.replace(var_name, str(var_value))
+    @input_backend.setter
+    def input_backend(self, backend):
+        self._input_backend = backend
 
-        return result
+    def _mouse_position(self):
+        """Get the mouse position (shared by $mouse_x and $mouse_y)"""
+        return self._cached('mouse', lambda: self.input_backend.get_position())
+
+    def lookup_variable(self, name, default=None):
+        """
+        Get a variable value as seen by replace_variables()
+
+        Special variables take precedence over system variables, then
+        loop variables, then user variables.
+
+        Args:
+            name: Variable name (with $ or @)
+            default: Value returned if the variable is not defined
+
+        Returns:
+            Variable value or default
+        """
+        if name in self.special_vars:
+            return self.special_vars[name]
+        if name in self.system_providers:
+            return self._read_system_var(name)
+        value = self._frame_value(name)
+        if value is not MISSING:
+            return value
+        return self.variables.get(name, default)
+
+    def replace_variables(self, text):
+        """
+        Replace all variables in text with their values
+
+        Args:
+            text: String containing variable references
+
+        Returns:
+            String with variables replaced (undefined ones are kept)
+        """
+        return VariableTemplate.parse(text).render(self)
 
     def register_function(self, name, body):
         """
@@ -116,17 +216,68 @@ class ExecutionContext:
         """
         return self.functions.get(name)
 
+    def push_frame(self, inherit=False):
+        """
+        Enter a new scope frame
+
+        Args:
+            inherit: Start with the values of the enclosing frame (function
+                calls see the loop counters of their caller)
+
+        Returns:
+            The frame, a list updated in place by the caller
+        """
+        if self._depth == len(self._frames):
+            self._frames.append([MISSING] * len(FRAME_SLOTS))
+        frame = self._frames[self._depth]
+        for slot in range(len(frame)):
+            frame[slot] = self.frame[slot] if inherit and self.frame is not None else MISSING
+        self._depth += 1
+        self.frame = frame
+        return frame
+
+    def pop_frame(self):
+        """Leave the innermost scope frame"""
+        self._depth -= 1
+        self.frame = self._frames[self._depth - 1] if self._depth else None
+
+    def _frame_value(self, name):
+        """
+        Get a frame variable from the innermost frame
+
+        Args:
+            name: Variable name
+
+        Returns:
+            Value, or MISSING if it is not a frame variable or is unset
+        """
+        slot = FRAME_SLOTS.get(name)
+        if slot is None or self.frame is None:
+            return MISSING
+        return self.frame[slot]
+
+    @property
+    def loop_vars(self):
+        """Loop counters visible at the current position (name -> value)"""
+        if self.frame is None:
+            return {}
+        return {name: self.frame[slot] for name, slot in FRAME_SLOTS.items()
+                if self.frame[slot] is not MISSING}
+
     def set_loop_var(self, name, value):
-        """Set a loop variable"""
-        self.loop_vars[name] = value
+        """Set a loop variable in the innermost frame"""
+        if self.frame is None:
+            self.push_frame()
+        self.frame[FRAME_SLOTS[name]] = value
 
     def set_special_var(self, name, value):
         """Set a special variable"""
         self.special_vars[name] = value
 
     def clear_loop_vars(self):
-        """Clear loop variables"""
-        self.loop_vars = {}
+        """Clear loop variables (leave every frame)"""
+        self._depth = 0
+        self.frame = None
 
     def get_all_variables(self):
         """Get all variables for debugging"""
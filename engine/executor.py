@@ -3,37 +3,81 @@ Macro Executor Module
 Executes parsed action trees with support for debug mode, functions, and advanced conditions
 """
 import threading
-import time
 from commands.keyboard import KeyboardCommands
 from commands.mouse import MouseCommands
 from commands.control import ControlCommands
+from commands.registry import CommandRegistry
 from utils.color import PixelDetector
-from utils.safe_eval import safe_eval_expr
+from utils.safe_eval import coerce_value, compile_expr, safe_eval_expr
+from utils.timing import PrecisionScheduler, RunControl
+from engine.compiler import Instruction, decode_line
+from engine.compact import CompactRun
+from engine.template import MISSING
+
+# Kinds of executor frames (see MacroExecutor._execute_actions)
+FRAME_BLOCK = 0                 # Branch or packed run, executed once
+FRAME_LOOP = 1                  # loop,N body
+FRAME_WHILE = 2                 # while body
+FRAME_CALL = 3                  # Function body, in its own scope frame
+
+# Nested function calls allowed before the run is stopped
+MAX_CALL_DEPTH = 1000
 
 
 class MacroExecutor:
     """Executes macro action trees"""
 
-    def __init__(self, context, gui_callback=None):
+    def __init__(self, context, gui_callback=None, commands=None, backend=None, clock=None):
         """
         Initialize executor
 
         Args:
             context: ExecutionContext instance
             gui_callback: Optional GUI callback for user interaction
+            commands: Optional dict of extra command handlers (opcode ->
+                handler), see CommandRegistry.register()
+            backend: Optional InputBackend for keyboard and mouse (default:
+                the context's, i.e. pynput unless it was given another)
+            clock: Optional VirtualClock; waits, holds, typing delays and
+                click/drag pauses advance it instead of sleeping (simulation)
         """
         self.context = context
+        if backend is not None:
+            context.input_backend = backend
+        self.backend = context.input_backend
         self.gui_callback = gui_callback
 
-        # Command modules
-        self.kb_commands = KeyboardCommands()
-        self.mouse_commands = MouseCommands()
-        self.ctrl_commands = ControlCommands()
+        # Stop/pause state; timed commands wake as soon as it changes
+        self.control = RunControl()
+        self.stop_event = self.control.stop_event
+        self.pause_event = self.control.pause_event
+
+        # Command modules, timed on one shared timeline
+        if clock is None:
+            self.scheduler = PrecisionScheduler(control=self.control)
+        else:
+            self.scheduler = PrecisionScheduler(clock=clock, sleep=clock.sleep,
+                                                spin_threshold=0, control=self.control)
+        self.kb_commands = KeyboardCommands(self.scheduler, self.backend)
+        self.mouse_commands = MouseCommands(self.scheduler, self.backend)
+        self.ctrl_commands = ControlCommands(self.scheduler)
         self.pixel_detector = PixelDetector()
 
-        # Control events
-        self.stop_event = threading.Event()
-        self.pause_event = threading.Event()
+        # Functions usable in conditions: pixel(x, y, "#RRGGBB", tol), exists($var)
+        self.expr_functions = {
+            'pixel': self._pixel_matches,
+            'exists': self.context.variable_exists
+        }
+
+        # Command dispatch table
+        self.registry = CommandRegistry()
+        self.kb_commands.register_commands(self.registry)
+        self.mouse_commands.register_commands(self.registry)
+        self.ctrl_commands.register_commands(self.registry)
+        self.registry.register('input', self._input)
+        self.registry.register('input_var', self._input)
+        for opcode, handler in (commands or {}).items():
+            self.registry.register(opcode, handler)
 
         # Debug mode
         self.debug_mode = False
@@ -58,8 +102,11 @@ class MacroExecutor:
             # Update system variables
             self.context.update_system_vars()
 
+            # Timed commands count from the start of this run
+            self.scheduler.reset()
+
             # Execute actions
-            self._execute_actions(actions, {}, speed, log_callback)
+            self._execute_actions(actions, speed, log_callback)
 
             if log_callback:
                 log_callback("✅ Macro terminée" if not self.stop_event.is_set() else "⏹ Macro arrêtée")
@@ -68,316 +115,389 @@ class MacroExecutor:
             if log_callback:
                 log_callback(f"[ERREUR GLOBALE] {e}")
 
-    def _execute_actions(self, actions, loop_vars, speed, log_callback):
+    def execute_chunks(self, chunks, speed=1.0, log_callback=None):
         """
-        Recursively execute actions with control flow
+        Execute an action tree delivered in chunks (see StreamingParser)
+
+        Each chunk is executed as soon as it is produced and then dropped.
+        A top-level break ends the macro, as it does with execute().
 
         Args:
-            actions: List of actions to execute
-            loop_vars: Current loop variables
+            chunks: Iterable of action lists
             speed: Speed multiplier
-            log_callback: Logging callback
+            log_callback: Optional logging callback
 
         Returns:
-            'BREAK' or 'CONTINUE' if encountered, None otherwise
+            False if producing or running a chunk failed (e.g. a syntax
+            error further down the script), True otherwise
         """
-        i = 0
-        while i < len(actions):
-            # Check for stop signal
-            if self.stop_event.is_set():
-                return
-
-            # Handle pause
-            while self.pause_event.is_set():
-                time.sleep(0.1)
-
-            action = actions[i]
-
-            # Extract line number if present
-            if isinstance(action, tuple) and len(action) >= 2:
-                line_num = action[-1]  # Last element is always line number
-                self.current_line = line_num
-            else:
-                line_num = None
-
-            # Debug mode: check for breakpoint
-            if self.debug_mode and line_num and line_num in self.breakpoints:
-                self.step_mode = True
-                if self.gui_callback and hasattr(self.gui_callback, 'on_breakpoint_hit'):
-                    self.gui_callback.on_breakpoint_hit(line_num, self.context.get_all_variables())
-
-            # Debug mode: wait for step signal
-            if self.debug_mode and self.step_mode:
-                if log_callback:
-                    log_callback(f"[DEBUG] Paused at line {line_num}")
-                self.step_event.wait()
-                self.step_event.clear()
-
-            # Handle control structures (tuples)
-            if isinstance(action, tuple):
-                cmd_type = action[0]
-
-                # LOOP
-                if cmd_type == 'LOOP':
-                    count, block = action[1], action[2]
-
-                    # Resolve count if it's a variable reference
-                    if isinstance(count, str) and count.startswith('$'):
-                        # Replace variable
-                        count_str = self.context.replace_variables(count)
-                        try:
-                            count = float(count_str)
-                        except ValueError:
-                            if log_callback:
-                                log_callback(f"[ERREUR] Loop count variable '{count}' invalid: {count_str}")
-                            count = 1  # Default to 1 iteration
-
-                    # Infinite loop
-                    if count == float('inf'):
-                        idx = 0
-                        while not self.stop_event.is_set():
-                            lv = dict(loop_vars)
-                            lv['$i'] = str(idx)
-                            self.context.loop_vars = lv
-
-                            result = self._execute_actions(block, lv, speed, log_callback)
-                            if result == 'BREAK':
-                                break
-                            idx += 1
-                    # Finite loop
-                    else:
-                        for idx in range(int(count)):
-                            if self.stop_event.is_set():
-                                break
+        try:
+            self.context.set_special_var('@speed', speed)
+            self.context.update_system_vars()
+            self.scheduler.reset()
 
-                            lv = dict(loop_vars)
-                            lv['$i'] = str(idx)
-                            self.context.loop_vars = lv
+            for actions in chunks:
+                if self.stop_event.is_set():
+                    break
+                if self._execute_actions(actions, speed, log_callback) in ('BREAK', 'CONTINUE'):
+                    break
 
-                            result = self._execute_actions(block, lv, speed, log_callback)
-                            if result == 'BREAK':
-                                break
+            if log_callback:
+                log_callback("✅ Macro terminée" if not self.stop_event.is_set() else "⏹ Macro arrêtée")
+            return True
 
-                    i += 1
-                    continue
+        except Exception as e:
+            if log_callback:
+                log_callback(f"[ERREUR GLOBALE] {e}")
+            return False
 
-                # WHILE
-                elif cmd_type == 'WHILE':
-                    cond, block = action[1], action[2]
-                    loops = 0
-
-                    while True:
-                        if self.stop_event.is_set():
-                            return
-
-                        # Update system variables for condition evaluation
-                        self.context.update_system_vars()
-
-                        # Evaluate condition
-                        try:
-                            cond_eval = self._evaluate_condition(cond)
-                        except Exception as e:
-                            if log_callback:
-                                log_callback(f"[ERREUR] Condition WHILE invalide: {cond} -> {e}")
-                            break
-
-                        if not cond_eval:
-                            break
-
-                        result = self._execute_actions(block, loop_vars, speed, log_callback)
-                        if result == 'BREAK':
-                            break
-
-                        loops += 1
-                        # Safety limit
-                        if loops > 100000:
-                            if log_callback:
-                                log_callback("[ERREUR] Boucle WHILE trop longue, coupée")
-                            break
-
-                    i += 1
-                    continue
+    def _execute_actions(self, actions, speed, log_callback):
+        """
+        Execute actions with control flow
 
-                # IF
-                elif cmd_type == 'IF':
-                    branches = action[1]
-                    executed = False
-
-                    for cond, block, _line in branches:
-                        if cond == 'else':
-                            if not executed:
-                                self._execute_actions(block, loop_vars, speed, log_callback)
-                                executed = True
-                                break
-                        else:
-                            # Update system variables
-                            self.context.update_system_vars()
+        Blocks are not run by recursion: entering a loop, a branch or a
+        function saves the position in the enclosing block on an explicit
+        stack of frames, and execution goes on in the inner block. When a
+        block ends its frame decides where execution resumes. Nesting depth
+        is not limited by Python's recursion limit; nested function calls
+        are limited to MAX_CALL_DEPTH, and going deeper stops the run.
 
-                            try:
-                                cond_eval = self._evaluate_condition(cond)
-                            except Exception as e:
+        break/continue drop the frames of the if blocks they are in and end
+        the body of the nearest loop (or function), so the normal path pays
+        nothing for them.
+
+        Args:
+            actions: List of actions to execute
+            speed: Speed multiplier
+            log_callback: Logging callback
+
+        Returns:
+            'BREAK' or 'CONTINUE' if one ends the top-level block, None otherwise
+        """
+        stack = []          # Frames: [kind, enclosing actions, resume index, state...]
+        index = 0
+        signal = None       # 'BREAK' or 'CONTINUE' ending the current body
+        depth = 0           # Number of FRAME_CALL frames on the stack
+
+        try:
+            while True:
+                # End of the current block: resume where its frame says
+                if index >= len(actions):
+                    if not stack:
+                        return signal
+                    frame = stack[-1]
+                    kind = frame[0]
+
+                    if kind == FRAME_LOOP:
+                        # frame: [kind, actions, index, block, count, idx, scope]
+                        idx = frame[5] + 1
+                        if signal != 'BREAK' and idx < frame[4] and not self.stop_event.is_set():
+                            frame[5] = idx
+                            frame[6][0] = idx
+                            actions, index, signal = frame[3], 0, None
+                            continue
+                        self.context.pop_frame()
+
+                    elif kind == FRAME_WHILE:
+                        # frame: [kind, actions, index, block, cond, loops]
+                        if signal != 'BREAK' and not self.stop_event.is_set():
+                            frame[5] += 1
+                            # Safety limit
+                            if frame[5] > 100000:
                                 if log_callback:
-                                    log_callback(f"[ERREUR] Condition IF invalide: {cond} -> {e}")
-                                cond_eval = False
+                                    log_callback("[ERREUR] Boucle WHILE trop longue, coupée")
+                            elif self._check_while(frame[4], log_callback):
+                                actions, index, signal = frame[3], 0, None
+                                continue
 
-                            if cond_eval:
-                                self._execute_actions(block, loop_vars, speed, log_callback)
-                                executed = True
-                                break
+                    elif kind == FRAME_CALL:
+                        self.context.pop_frame()
+                        depth -= 1
 
-                    i += 1
+                    stack.pop()
+                    actions, index, signal = frame[1], frame[2], None
                     continue
 
-                # BREAK
-                elif cmd_type == 'BREAK':
-                    return 'BREAK'
-
-                # CONTINUE
-                elif cmd_type == 'CONTINUE':
-                    return 'CONTINUE'
-
-                # BREAKPOINT (debug mode)
-                elif cmd_type == 'BREAKPOINT':
-                    if self.debug_mode:
-                        self.step_mode = True
-                        if self.gui_callback and hasattr(self.gui_callback, 'on_breakpoint_hit'):
-                            self.gui_callback.on_breakpoint_hit(line_num, self.context.get_all_variables())
-                    i += 1
+                # Check for stop signal
+                if self.stop_event.is_set():
+                    return
+
+                # Handle pause
+                if self.pause_event.is_set() and not self.control.wait_resumed():
+                    return
+
+                action = actions[index]
+                index += 1
+
+                # Packed run of simple commands: execute it like a block
+                if isinstance(action, CompactRun):
+                    stack.append([FRAME_BLOCK, actions, index])
+                    actions, index = action, 0
                     continue
 
-                # CALL_FUNCTION
-                elif cmd_type == 'CALL_FUNCTION':
-                    func_name = action[1]
-                    func_body = self.context.get_function(func_name)
+                # Extract line number if present
+                if isinstance(action, Instruction):
+                    line_num = action.line_num
+                    self.current_line = line_num
+                elif isinstance(action, tuple) and len(action) >= 2:
+                    line_num = action[-1]  # Last element is always line number
+                    self.current_line = line_num
+                else:
+                    line_num = None
+
+                # Debug mode: check for breakpoint
+                if self.debug_mode and line_num and line_num in self.breakpoints:
+                    self.step_mode = True
+                    if self.gui_callback and hasattr(self.gui_callback, 'on_breakpoint_hit'):
+                        self.gui_callback.on_breakpoint_hit(line_num, self.context.get_all_variables())
+
+                # Debug mode: wait for step signal
+                if self.debug_mode and self.step_mode:
+                    if log_callback:
+                        log_callback(f"[DEBUG] Paused at line {line_num}")
+                    self.step_event.wait()
+                    self.step_event.clear()
+
+                # Compiled command
+                if isinstance(action, Instruction):
+                    if action.slots:
+                        # New tick: system variables are read again if referenced
+                        self.context.tick += 1
+                        line = action.template.render(self.context)
+                        args = None
+                    else:
+                        line = action.source
+                        args = action.args
+
+                else:
+                    # Handle control structures (tuples)
+                    if isinstance(action, tuple):
+                        cmd_type = action[0]
+
+                        # LOOP
+                        if cmd_type == 'LOOP':
+                            count = self._loop_count(action[1], log_callback)
+                            if count > 0:
+                                # The counter lives in a scope frame and is updated in place
+                                scope = self.context.push_frame()
+                                scope[0] = 0
+                                stack.append([FRAME_LOOP, actions, index, action[2], count, 0, scope])
+                                actions, index = action[2], 0
+                            continue
+
+                        # WHILE
+                        elif cmd_type == 'WHILE':
+                            if self._check_while(action[1], log_callback):
+                                stack.append([FRAME_WHILE, actions, index, action[2], action[1], 0])
+                                actions, index = action[2], 0
+                            continue
+
+                        # IF
+                        elif cmd_type == 'IF':
+                            block = self._select_branch(action[1], log_callback)
+                            if block is not None:
+                                stack.append([FRAME_BLOCK, actions, index])
+                                actions, index = block, 0
+                            continue
+
+                        # ASSIGN (produced by the parser in pure mode)
+                        elif cmd_type == 'ASSIGN':
+                            name, expr = action[1], action[2]
+                            self.context.tick += 1
+                            try:
+                                value = safe_eval_expr(expr, self.context.scope)
+                            except Exception:
+                                # If evaluation fails, store as string (like the parser)
+                                value = expr
+                            self.context.set_variable(name, value)
+                            continue
+
+                        # BREAK / CONTINUE
+                        elif cmd_type == 'BREAK' or cmd_type == 'CONTINUE':
+                            # Leave the enclosing if blocks, then end the loop body
+                            while stack and stack[-1][0] == FRAME_BLOCK:
+                                stack.pop()
+                            signal = cmd_type
+                            actions, index = (), 0
+                            continue
+
+                        # BREAKPOINT (debug mode)
+                        elif cmd_type == 'BREAKPOINT':
+                            if self.debug_mode:
+                                self.step_mode = True
+                                if self.gui_callback and hasattr(self.gui_callback, 'on_breakpoint_hit'):
+                                    self.gui_callback.on_breakpoint_hit(line_num, self.context.get_all_variables())
+                            continue
+
+                        # CALL_FUNCTION
+                        elif cmd_type == 'CALL_FUNCTION':
+                            func_name = action[1]
+                            if len(action) == 4:
+                                # Linked by the compiler
+                                func_body = action[2]
+                            else:
+                                func_body = self.context.get_function(func_name)
+
+                            # An empty body (e.g. folded by the optimizer) is still a function
+                            if func_body is not None:
+                                if depth >= MAX_CALL_DEPTH:
+                                    if log_callback:
+                                        log_callback(f"[ERREUR] {func_name}() : profondeur d'appel "
+                                                     f"maximale ({MAX_CALL_DEPTH}) atteinte")
+                                    self.stop()
+                                    return
 
-                    if func_body:
-                        if log_callback:
-                            log_callback(f"[FUNCTION] Calling {func_name}()")
+                                if log_callback:
+                                    log_callback(f"[FUNCTION] Calling {func_name}()")
+
+                                # Function frame: sees the caller's loop counters
+                                self.context.push_frame(inherit=True)
+                                stack.append([FRAME_CALL, actions, index])
+                                depth += 1
+                                actions, index = func_body, 0
+                            else:
+                                if log_callback:
+                                    log_callback(f"[ERREUR] Function '{func_name}' not found")
+                            continue
 
-                        self._execute_actions(func_body, loop_vars, speed, log_callback)
+                    # String action (uncompiled tree)
+                    if isinstance(action, tuple) and len(action) == 2:
+                        line, line_num = action
                     else:
-                        if log_callback:
-                            log_callback(f"[ERREUR] Function '{func_name}' not found")
+                        line = action
+                        line_num = None
 
-                    i += 1
-                    continue
+                    # Replace variables
+                    self.context.tick += 1
+                    line = self.context.replace_variables(line)
+                    args = None
 
-            # String action (command)
-            if isinstance(action, tuple) and len(action) == 2:
-                line, line_num = action
-            else:
-                line = action
-                line_num = None
+                if log_callback:
+                    log_callback(f"{line}")
 
-            # Replace variables
-            self.context.update_system_vars()
-            line = self.context.replace_variables(line)
+                # Execute command: undecoded lines are decoded after substitution
+                try:
+                    if args is None:
+                        opcode, args = decode_line(line)
+                    else:
+                        opcode = action.opcode
+                    handler = self.registry.get(opcode)
+                    if handler is None:
+                        if log_callback:
+                            log_callback(f"[UNKNOWN CMD] {opcode}")
+                    else:
+                        handler(args, speed, log_callback)
+                except Exception as e:
+                    if log_callback:
+                        log_callback(f"[ERREUR] {line} → {e}")
+        finally:
+            # Stopped or failed inside blocks: leave their scope frames
+            for frame in stack:
+                if frame[0] in (FRAME_LOOP, FRAME_CALL):
+                    self.context.pop_frame()
+
+    def _loop_count(self, count, log_callback):
+        """
+        Resolve the iteration count of a loop
 
-            if log_callback:
-                log_callback(f"{line}")
+        Args:
+            count: Loop count (number, float('inf') or '$name')
+            log_callback: Logging callback
 
-            # Execute command
+        Returns:
+            int count, or float('inf') for an infinite loop
+        """
+        # Resolve count if it's a variable reference
+        if isinstance(count, str) and count.startswith('$'):
+            # New tick for system variables in the count
+            self.context.tick += 1
+            count_str = self.context.replace_variables(count)
             try:
-                self._execute_command(line, speed, log_callback)
-            except Exception as e:
+                count = float(count_str)
+            except ValueError:
                 if log_callback:
-                    log_callback(f"[ERREUR] {line} → {e}")
+                    log_callback(f"[ERREUR] Loop count variable '{count}' invalid: {count_str}")
+                count = 1  # Default to 1 iteration
 
-            i += 1
+        return count if count == float('inf') else int(count)
 
-    def _execute_command(self, line, speed, log_callback):
+    def _check_while(self, cond, log_callback):
         """
-        Execute a single command
+        Evaluate the condition of a while loop
 
         Args:
-            line: Command line
-            speed: Speed multiplier
+            cond: Condition text, or True if folded by the optimizer
             log_callback: Logging callback
-        """
-        parts = [p.strip() for p in line.split(',')]
-        cmd = parts[0].lower()
 
-        # Keyboard commands
-        if cmd == 'press':
-            keys_str = parts[1]
-            dur_str = parts[2]
-            duration = float(dur_str)
-            self.kb_commands.press(keys_str, duration, speed)
+        Returns:
+            True if the loop body must run (False on invalid conditions)
+        """
+        # Condition folded to True by the optimizer
+        if cond is True:
+            return True
 
-        elif cmd == 'hotkey':
-            keys_str = parts[1]
-            self.kb_commands.hotkey(keys_str)
+        # New tick for system variables in the condition
+        self.context.tick += 1
+        try:
+            return bool(self._evaluate_condition(cond))
+        except Exception as e:
+            if log_callback:
+                log_callback(f"[ERREUR] Condition WHILE invalide: {cond} -> {e}")
+            return False
 
-        elif cmd == 'type':
-            text = parts[1]
-            self.kb_commands.type_text(text, speed)
+    def _select_branch(self, branches, log_callback):
+        """
+        Find the branch of an if/elseif/else chain to execute
 
-        # Mouse commands
-        elif cmd in ['lmc', 'rmc', 'mmc']:
-            self.mouse_commands.click_button(cmd)
+        Args:
+            branches: List of (condition or 'else', block, line_num)
+            log_callback: Logging callback
 
-        elif cmd == 'click':
-            x, y = int(parts[1]), int(parts[2])
-            btn = parts[3] if len(parts) > 3 else 'left'
-            self.mouse_commands.click_at(x, y, btn)
+        Returns:
+            Block of the first branch that applies, or None
+        """
+        for cond, block, _line in branches:
+            if cond == 'else':
+                return block
 
-        elif cmd == 'move':
-            x, y = int(parts[1]), int(parts[2])
-            self.mouse_commands.move(x, y)
-
-        elif cmd == 'drag':
-            x1, y1 = int(parts[1]), int(parts[2])
-            x2, y2 = int(parts[3]), int(parts[4])
-            self.mouse_commands.drag(x1, y1, x2, y2)
-
-        elif cmd == 'scroll':
-            direction = parts[1]
-            amount = int(parts[2])
-            self.mouse_commands.scroll(direction, amount)
-
-        elif cmd == 'on':
-            btn = parts[1]
-            self.mouse_commands.button_down(btn)
-
-        elif cmd == 'off':
-            btn = parts[1]
-            self.mouse_commands.button_up(btn)
-
-        # Control commands
-        elif cmd == 'wait':
-            seconds = float(parts[1])
-            self.ctrl_commands.wait(seconds, speed)
-
-        elif cmd == 'echo':
-            message = ','.join(parts[1:])
-            self.ctrl_commands.echo(message, log_callback)
-
-        elif cmd == 'input' or cmd == 'input_var':
-            # Handle both: input,"prompt",$var and input_var,$var,"prompt"
-            if cmd == 'input_var':
-                var_name = parts[1].strip()
-                prompt = parts[2].strip().strip('"') if len(parts) > 2 else "Enter value"
-            else:
-                prompt = parts[1].strip('"')
-                var_name = parts[2] if len(parts) > 2 else None
-
-            # Ask for input via GUI callback
-            if self.gui_callback and hasattr(self.gui_callback, 'ask_input'):
-                val = self.gui_callback.ask_input(prompt)
-            else:
-                val = input(f"{prompt}: ")
-
-            if val is None:
-                val = ""
-
-            if var_name and var_name.startswith('$'):
-                self.context.set_variable(var_name, val)
+            # New tick for system variables in the condition
+            self.context.tick += 1
+            try:
+                cond_eval = self._evaluate_condition(cond)
+            except Exception as e:
                 if log_callback:
-                    log_callback(f"[INPUT] {var_name} = {val}")
+                    log_callback(f"[ERREUR] Condition IF invalide: {cond} -> {e}")
+                cond_eval = False
 
+            if cond_eval:
+                return block
+        return None
+
+    def _input(self, args, speed, log_callback):
+        """
+        Ask the user for a value (input and input_var commands)
+
+        Args:
+            args: Tuple of (prompt, var_name)
+            speed: Speed multiplier (unused)
+            log_callback: Logging callback
+        """
+        # Handle both: input,"prompt",$var and input_var,$var,"prompt"
+        prompt, var_name = args
+
+        # Ask for input via GUI callback
+        if self.gui_callback and hasattr(self.gui_callback, 'ask_input'):
+            val = self.gui_callback.ask_input(prompt)
         else:
+            val = input(f"{prompt}: ")
+
+        if val is None:
+            val = ""
+
+        if var_name and var_name.startswith('$'):
+            self.context.set_variable(var_name, val)
             if log_callback:
-                log_callback(f"[UNKNOWN CMD] {cmd}")
+                log_callback(f"[INPUT] {var_name} = {val}")
 
     def _evaluate_condition(self, condition):
         """
@@ -389,6 +509,18 @@ class MacroExecutor:
         Returns:
             Boolean result
         """
+        head = condition.split(',', 1)[0].strip().lower()
+        if head not in ('pixel', 'exists'):
+            # Standard expression, compiled once and evaluated against the scope
+            return bool(compile_expr(condition).evaluate(self._resolve_variable,
+                                                         self.expr_functions))
+
+        # exists,$var: the name must not be replaced by its value
+        if head == 'exists':
+            var_name = condition.split(',', 2)[1].strip() if ',' in condition else ''
+            if var_name:
+                return self.context.variable_exists(var_name)
+
         # Replace variables in condition
         cond_text = self.context.replace_variables(condition)
 
@@ -402,13 +534,40 @@ class MacroExecutor:
             tolerance = int(parts[4]) if len(parts) > 4 else 10
             return self.pixel_detector.check_pixel(x, y, color, tolerance)
 
-        # exists,$var
-        if parts[0].lower() == 'exists' and len(parts) >= 2:
-            var_name = parts[1]
-            return self.context.variable_exists(var_name)
+        raise ValueError(f"Condition incomplète : {cond_text}")
+
+    def _pixel_matches(self, x, y, color, tolerance=10):
+        """
+        Check a pixel color (pixel() in conditions)
+
+        Args:
+            x: X coordinate
+            y: Y coordinate
+            color: Hex color string ('#RRGGBB')
+            tolerance: Color tolerance
+
+        Returns:
+            True if the pixel matches
+        """
+        return self.pixel_detector.check_pixel(int(x), int(y), str(color), int(tolerance))
+
+    def _resolve_variable(self, name):
+        """
+        Get a variable value for a condition
+
+        Args:
+            name: Variable name ($name or @name)
 
-        # Standard expression
-        return bool(safe_eval_expr(cond_text, {}))
+        Returns:
+            Value (numeric strings as numbers, like in the script text)
+
+        Raises:
+            KeyError: If the variable is not defined
+        """
+        value = self.context.lookup_variable(name, MISSING)
+        if value is MISSING:
+            raise KeyError(name)
+        return coerce_value(value)
 
     # Control methods
     def stop(self):
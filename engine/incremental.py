@@ -0,0 +1,271 @@
+"""
+Incremental Parser Module
+Re-parses only the top-level statements touched by an edit
+Untouched statements reuse their previous subtree (line numbers shifted)
+"""
+from engine.parser import Diagnostic, ScriptParser, starts_statement
+
+
+class _Segment:
+    """A top-level statement and the raw lines it spans"""
+
+    __slots__ = ('start', 'end', 'lines', 'assignments', 'declared', 'actions',
+                 'functions', 'diagnostics', 'known_before', 'stray_end_line')
+
+    def __init__(self, start, end):
+        self.start = start              # First raw line index (0-based)
+        self.end = end                  # One past the last raw line index
+        self.lines = None               # Prepared lines, kept until the first build
+        self.assignments = None         # (name, expr) pairs, in order
+        self.declared = None            # Function names defined in the statement
+        self.actions = None             # Parsed actions (None = needs build)
+        self.functions = []             # (name, body) registered by the statement
+        self.diagnostics = []           # Diagnostics found while building it
+        self.known_before = None        # Function names known when it was built
+        self.stray_end_line = None      # Set if an unmatched end marker stopped it
+
+
+def _shift_actions(actions, delta):
+    """
+    Shift the line numbers of an action tree
+
+    Args:
+        actions: Parsed actions
+        delta: Number of lines to add
+
+    Returns:
+        New list of actions
+    """
+    shifted = []
+    for action in actions:
+        cmd_type = action[0]
+        if cmd_type in ('LOOP', 'WHILE'):
+            shifted.append((cmd_type, action[1], _shift_actions(action[2], delta), action[3] + delta))
+        elif cmd_type == 'IF':
+            branches = [(cond, _shift_actions(block, delta), line + delta)
+                        for cond, block, line in action[1]]
+            shifted.append(('IF', branches, action[2] + delta))
+        else:
+            # Line number is always the last element
+            shifted.append(action[:-1] + (action[-1] + delta,))
+    return shifted
+
+
+class IncrementalParser(ScriptParser):
+    """ScriptParser that keeps the previous parse and only redoes what changed"""
+
+    def __init__(self, context=None, pure=False):
+        """
+        Initialize incremental parser
+
+        Args:
+            context: ExecutionContext instance for variable storage
+                (optional in pure mode)
+            pure: Enable side-effect-free parsing (see ScriptParser)
+        """
+        super().__init__(context, pure)
+        self._raw_lines = []
+        self._segments = []
+        self._recovering = False        # Mode the segments were built in
+        self.reparsed_lines = 0         # Raw lines re-parsed by the last parse()
+
+    def reset(self):
+        """Forget the previous parse (the next one is a full parse)"""
+        self._raw_lines = []
+        self._segments = []
+
+    def parse(self, script):
+        """
+        Parse a macro script, reusing unchanged statements
+
+        The previous and new texts are compared line by line; the top-level
+        statements overlapping the changed lines are re-parsed and spliced
+        between the untouched ones. Variable declarations are re-evaluated
+        in order and functions re-registered, so the context ends up exactly
+        as after a full parse. A statement is also rebuilt when the set of
+        functions it can call changed, since call resolution depends on it.
+
+        Args:
+            script: Script text to parse
+
+        Returns:
+            List of actions (action tree)
+        """
+        raw_lines = script.splitlines()
+        self._reset_functions()
+        self.stray_end_line = None
+        self.diagnostics = []
+
+        # Recovering and strict parses build different trees
+        if self.recover != self._recovering:
+            self.reset()
+            self._recovering = self.recover
+
+        self._splice(raw_lines)
+
+        # First pass: variables are evaluated in line order
+        for segment in self._segments:
+            for name, expr in segment.assignments:
+                self.assign_variable(name, expr)
+
+        # Functions can be called before their definition
+        self.hoisted = set().union(*(segment.declared for segment in self._segments))
+
+        # Second pass: build (or reuse) each statement's subtree
+        actions = []
+        known = frozenset(self.functions) | self.hoisted
+        stopped = False
+
+        for segment in self._segments:
+            if stopped:
+                # A full parse never reaches these; rebuild them when it does
+                segment.actions = None
+                continue
+
+            if segment.actions is None or segment.known_before != known:
+                self._build(segment, raw_lines)
+            else:
+                for name, body in segment.functions:
+                    self.functions[name] = body
+
+            actions.extend(segment.actions)
+            self.diagnostics.extend(segment.diagnostics)
+            if segment.functions:
+                known = frozenset(self.functions) | self.hoisted
+            if segment.stray_end_line is not None:
+                self.stray_end_line = segment.stray_end_line
+                stopped = True
+
+        return actions
+
+    def _splice(self, raw_lines):
+        """
+        Replace the segments covering the changed lines
+
+        Args:
+            raw_lines: New list of raw lines
+        """
+        old_lines = self._raw_lines
+        segments = self._segments
+        self._raw_lines = raw_lines
+
+        if not segments:
+            self._segments = self._split(raw_lines, 0, len(raw_lines))
+            return
+
+        # Common prefix and suffix of the old and new texts
+        limit = min(len(old_lines), len(raw_lines))
+        prefix = 0
+        while prefix < limit and old_lines[prefix] == raw_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < limit - prefix and
+               old_lines[-1 - suffix] == raw_lines[-1 - suffix]):
+            suffix += 1
+
+        if prefix == len(old_lines) == len(raw_lines):
+            self.reparsed_lines = 0
+            return
+
+        old_end = len(old_lines) - suffix
+        delta = len(raw_lines) - len(old_lines)
+
+        # First touched statement; include the previous one when the edit
+        # starts on a statement boundary (the new line may continue it)
+        first = 0
+        while first < len(segments) - 1 and segments[first].end <= prefix:
+            first += 1
+        if first > 0 and segments[first].start >= prefix:
+            first -= 1
+
+        # Last touched statement
+        last = first
+        while last < len(segments) - 1 and segments[last + 1].start < old_end:
+            last += 1
+
+        region_start = segments[first].start
+        region_end = segments[last].end + delta
+
+        tail = segments[last + 1:]
+        if delta:
+            for segment in tail:
+                segment.start += delta
+                segment.end += delta
+                segment.lines = None
+                if segment.stray_end_line is not None:
+                    segment.stray_end_line += delta
+                if segment.actions is not None:
+                    segment.actions = _shift_actions(segment.actions, delta)
+                    segment.functions = [(name, _shift_actions(body, delta))
+                                         for name, body in segment.functions]
+                    segment.diagnostics = [
+                        Diagnostic(d.line + delta, d.col_start, d.col_end, d.code, d.message)
+                        for d in segment.diagnostics
+                    ]
+
+        self._segments = (segments[:first] +
+                          self._split(raw_lines, region_start, region_end) +
+                          tail)
+
+    def _split(self, raw_lines, start, end):
+        """
+        Split a range of raw lines into top-level statements
+
+        Args:
+            raw_lines: List of raw lines
+            start: First line index
+            end: One past the last line index
+
+        Returns:
+            List of new (unbuilt) segments
+        """
+        self.reparsed_lines = end - start
+        segments = []
+        seg_start = start
+
+        for idx in range(start + 1, end):
+            if starts_statement(raw_lines[idx], self.pure):
+                segments.append(_Segment(seg_start, idx))
+                seg_start = idx
+        if end > start:
+            segments.append(_Segment(seg_start, end))
+
+        for segment in segments:
+            segment.assignments = []
+            segment.lines = self._prepare_lines(raw_lines[segment.start:segment.end],
+                                                segment.start + 1, segment.assignments)
+            segment.declared = self.declared_functions(segment.lines)
+
+        return segments
+
+    def _build(self, segment, raw_lines):
+        """
+        Build a statement's subtree and record the functions it defines
+
+        Args:
+            segment: Segment to build
+            raw_lines: Current list of raw lines
+        """
+        # Assignments were collected by _split and are evaluated by parse()
+        lines = segment.lines
+        if lines is None:
+            lines = self._prepare_lines(raw_lines[segment.start:segment.end],
+                                        segment.start + 1, [])
+        segment.lines = None
+        before = dict(self.functions)
+        segment.actions = None
+        segment.known_before = frozenset(before) | self.hoisted
+
+        self.stray_end_line = None
+        diagnostics = self.diagnostics
+        self.diagnostics = []
+        try:
+            actions, _ = self._parse_block(lines, 0, 0)
+        finally:
+            segment.diagnostics = self.diagnostics
+            self.diagnostics = diagnostics
+
+        segment.functions = [(name, body) for name, body in self.functions.items()
+                             if before.get(name) is not body]
+        segment.stray_end_line = self.stray_end_line
+        segment.actions = actions
@@ -0,0 +1,345 @@
+"""
+Macro Optimizer Module
+Simplifies compiled action trees before execution
+Folds constant conditions, drops dead branches and empty loops, merges waits
+"""
+from engine.compiler import Instruction, VAR_REF_PATTERN, compile_line
+from utils.safe_eval import coerce_value, compile_expr, safe_eval_expr
+
+# Names the executor sets at runtime; they are never constants
+RUNTIME_VARIABLES = ('$i', '$mouse_x', '$mouse_y', '$screen_width', '$screen_height')
+
+# Commands that write the variable they reference
+INPUT_OPCODES = ('input', 'input_var')
+
+
+class MacroOptimizer:
+    """Optimization pass over compiled action trees"""
+
+    def __init__(self):
+        """Initialize optimizer"""
+        self.folded = 0                 # Conditions, counts and commands folded
+        self.removed = 0                # Branches and loops removed
+        self.merged = 0                 # Wait commands merged into another
+
+    def optimize(self, actions, functions=None, variables=None):
+        """
+        Optimize an action tree
+
+        A variable is constant when nothing can change it while the macro
+        runs: it is declared at parse time (variables) or by a single
+        top-level assignment in pure mode, and no other assignment or input
+        command targets it. Top-level assignments only count as constants
+        for the statements that follow them, since functions and earlier
+        statements may run before they do.
+
+        Function bodies are optimized in place so linked call sites see
+        the result.
+
+        Args:
+            actions: Action tree from MacroCompiler.compile()
+            functions: Optional dict of compiled function bodies
+            variables: Variables declared at parse time (name -> value)
+
+        Returns:
+            Optimized action tree
+        """
+        functions = functions or {}
+        written = {}
+        self._count_writes(actions, written)
+        for body in functions.values():
+            self._count_writes(body, written)
+
+        constants = {
+            name: value for name, value in (variables or {}).items()
+            if name not in written and name not in RUNTIME_VARIABLES
+        }
+
+        for body in functions.values():
+            body[:] = self._optimize_block(body, constants)
+
+        return self._optimize_block(actions, constants, written)
+
+    def _count_writes(self, actions, written):
+        """
+        Count the runtime writes of each variable
+
+        Args:
+            actions: List of compiled actions
+            written: Dict (name -> count) updated in place
+        """
+        for action in actions:
+            if isinstance(action, Instruction):
+                if action.opcode in INPUT_OPCODES:
+                    for name in VAR_REF_PATTERN.findall(action.source):
+                        written[name] = written.get(name, 0) + 1
+                continue
+
+            cmd_type = action[0]
+            if cmd_type in ('LOOP', 'WHILE'):
+                self._count_writes(action[2], written)
+            elif cmd_type == 'IF':
+                for _cond, block, _line in action[1]:
+                    self._count_writes(block, written)
+            elif cmd_type == 'ASSIGN':
+                written[action[1]] = written.get(action[1], 0) + 1
+
+    def _optimize_block(self, actions, constants, written=None):
+        """
+        Optimize a list of actions
+
+        Args:
+            actions: List of compiled actions
+            constants: Constant variables visible to the block (name -> value)
+            written: Write counts; given for the top-level block only, where
+                single assignments become constants for what follows
+
+        Returns:
+            New list of actions
+        """
+        optimized = []
+
+        for action in actions:
+            if isinstance(action, Instruction):
+                optimized.append(self._fold_instruction(action, constants))
+                continue
+
+            cmd_type = action[0]
+
+            if cmd_type == 'LOOP':
+                _, count, block, line_num = action
+                count = self._fold_count(count, constants)
+                block = self._optimize_block(block, constants)
+                if count != float('inf') and not isinstance(count, str) and (int(count) <= 0 or not block):
+                    self.removed += 1
+                    continue
+                optimized.append(('LOOP', count, block, line_num))
+
+            elif cmd_type == 'WHILE':
+                _, cond, block, line_num = action
+                value = self._fold_condition(cond, constants)
+                if value is False:
+                    self.removed += 1
+                    continue
+                if value is True:
+                    cond = True
+                optimized.append(('WHILE', cond, self._optimize_block(block, constants), line_num))
+
+            elif cmd_type == 'IF':
+                optimized.extend(self._optimize_if(action, constants))
+
+            elif cmd_type == 'ASSIGN' and written is not None:
+                optimized.append(action)
+                _, name, expr, _line = action
+                if written.get(name) == 1 and name not in RUNTIME_VARIABLES:
+                    value = self._fold_value(expr, constants)
+                    if value is not None:
+                        constants = dict(constants)
+                        constants[name] = value
+
+            else:
+                optimized.append(action)
+
+        return self._merge_waits(optimized)
+
+    def _optimize_if(self, action, constants):
+        """
+        Optimize an if/elseif/else chain
+
+        Branches whose condition is always false are dropped, and the first
+        branch that is always true ends the chain. When only that branch is
+        left its block replaces the whole statement.
+
+        Args:
+            action: ('IF', branches, line_num)
+            constants: Constant variables visible to the statement
+
+        Returns:
+            List of actions replacing the statement (possibly empty)
+        """
+        branches = []
+
+        for cond, block, line in action[1]:
+            block = self._optimize_block(block, constants)
+            if cond == 'else':
+                branches.append(('else', block, line))
+                break
+
+            value = self._fold_condition(cond, constants)
+            if value is False:
+                self.removed += 1
+                continue
+            if value is True:
+                branches.append(('else', block, line))
+                break
+            branches.append((cond, block, line))
+
+        if not branches:
+            return []
+
+        if len(branches) == 1 and branches[0][0] == 'else':
+            return branches[0][1]
+
+        return [('IF', branches, action[2])]
+
+    def _fold_condition(self, cond, constants):
+        """
+        Evaluate a condition at compile time if it only uses constants
+
+        Args:
+            cond: Condition text
+            constants: Constant variables (name -> value)
+
+        Returns:
+            True or False if the condition is constant, None otherwise
+        """
+        if not isinstance(cond, str) or '@' in cond:
+            return cond if isinstance(cond, bool) else None
+
+        head = cond.split(',', 1)[0].strip().lower()
+        if head in ('pixel', 'exists'):
+            return None
+
+        if any(name not in constants for name in VAR_REF_PATTERN.findall(cond)):
+            return None
+
+        try:
+            compiled = compile_expr(cond)
+            if compiled.calls:
+                # pixel() and exists() depend on the screen and the scope
+                return None
+            # Same resolution as MacroExecutor._evaluate_condition()
+            value = bool(compiled.evaluate(lambda name: coerce_value(constants[name])))
+        except Exception:
+            # Invalid conditions are reported when they run
+            return None
+
+        self.folded += 1
+        return value
+
+    def _fold_count(self, count, constants):
+        """
+        Resolve a loop count stored as a variable reference
+
+        Args:
+            count: Loop count (number or '$name')
+            constants: Constant variables (name -> value)
+
+        Returns:
+            Numeric count if it could be resolved, the original count otherwise
+        """
+        if not isinstance(count, str) or not count.startswith('$'):
+            return count
+
+        text = self._substitute(count, constants)
+        if text is None:
+            return count
+        try:
+            value = float(text)
+        except ValueError:
+            return count
+
+        self.folded += 1
+        return value
+
+    def _fold_value(self, expr, constants):
+        """
+        Evaluate an assigned expression like the executor would
+
+        Args:
+            expr: Expression text
+            constants: Constant variables (name -> value)
+
+        Returns:
+            Value, or None if it depends on runtime state
+        """
+        if '@' in expr:
+            return None
+        refs = VAR_REF_PATTERN.findall(expr)
+        if any(name not in constants for name in refs):
+            return None
+        try:
+            return safe_eval_expr(expr, {name: constants[name] for name in refs})
+        except Exception:
+            # The executor stores the text when evaluation fails
+            return expr
+
+    def _fold_instruction(self, instruction, constants):
+        """
+        Pre-decode a command whose variables are all constants
+
+        Args:
+            instruction: Instruction with or without slots
+            constants: Constant variables (name -> value)
+
+        Returns:
+            Instruction (a new one if it was folded)
+        """
+        if not instruction.slots or instruction.opcode in INPUT_OPCODES:
+            return instruction
+
+        line = self._substitute(instruction.source, constants)
+        if line is None:
+            return instruction
+
+        self.folded += 1
+        return compile_line(line, instruction.line_num)
+
+    @staticmethod
+    def _substitute(text, constants):
+        """
+        Replace the variable references of a text with constant values
+
+        Args:
+            text: Text with $name references
+            constants: Constant variables (name -> value)
+
+        Returns:
+            Substituted text, or None if a reference is not constant
+        """
+        if '@' in text:
+            return None
+        refs = VAR_REF_PATTERN.findall(text)
+        if any(name not in constants for name in refs):
+            return None
+        return VAR_REF_PATTERN.sub(lambda m: str(constants[m.group(0)]), text)
+
+    def _merge_waits(self, actions):
+        """
+        Merge runs of adjacent constant wait commands
+
+        Args:
+            actions: List of optimized actions
+
+        Returns:
+            New list of actions
+        """
+        merged = []
+
+        for action in actions:
+            if (isinstance(action, Instruction) and action.opcode == 'wait' and
+                    action.args is not None and merged):
+                previous = merged[-1]
+                if (isinstance(previous, Instruction) and previous.opcode == 'wait' and
+                        previous.args is not None):
+                    total = previous.args[0] + action.args[0]
+                    merged[-1] = Instruction('wait', (total,), (), f"wait,{total:g}",
+                                             previous.line_num)
+                    self.merged += 1
+                    continue
+            merged.append(action)
+
+        return merged
+
+    def get_stats(self):
+        """
+        Get optimization statistics
+
+        Returns:
+            Dict with folded, removed and merged counts
+        """
+        return {
+            'folded': self.folded,
+            'removed': self.removed,
+            'merged': self.merged
+        }
@@ -3,20 +3,105 @@ Script Parser Module
 Parses the DSL macro language into an action tree
 Supports: variables, loops, conditions, functions, breakpoints
 """
+import re
 from utils.safe_eval import safe_eval_expr
 
+# A line that can only be a function call: name()
+CALL_PATTERN = re.compile(r'^[A-Za-z_]\w*\s*\(\s*\)$')
+
+# Commands that continue the block opened by a previous statement
+CONTINUATION_COMMANDS = ('elseif', 'else', 'endif', 'endloop', 'next', 'endwhile', 'endfunction')
+
+# Commands that close a block
+END_COMMANDS = ('endif', 'endloop', 'next', 'endwhile', 'endfunction')
+
+
+class Diagnostic:
+    """A syntax problem found by the parser"""
+
+    # Diagnostic codes
+    MISSING_CONDITION = 'missing-condition'
+    MISSING_NAME = 'missing-name'
+    UNKNOWN_FUNCTION = 'unknown-function'
+    UNMATCHED_END = 'unmatched-end'
+
+    __slots__ = ('line', 'col_start', 'col_end', 'code', 'message')
+
+    def __init__(self, line, col_start, col_end, code, message):
+        """
+        Initialize diagnostic
+
+        Args:
+            line: Line number (1-indexed)
+            col_start: First column of the faulty text (0-indexed)
+            col_end: Column right after the faulty text
+            code: Diagnostic code (class constants)
+            message: Human readable message, without location
+        """
+        self.line = line
+        self.col_start = col_start
+        self.col_end = col_end
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return f"{self.message} at line {self.line}"
+
+    def __repr__(self):
+        return f"Diagnostic({self.code!r}, line={self.line}, cols={self.col_start}-{self.col_end})"
+
+
+def starts_statement(raw, pure=False):
+    """
+    Check whether a raw line starts a new top-level statement
+
+    Top-level statements are independent: everything up to the next one
+    (nested lines, comments, declarations, elseif/else and end markers)
+    belongs to them. Declarations are removed by the first pass, so they
+    never interrupt a block, except `$x = input,...` which becomes a command.
+    In pure mode declarations stay in the tree and are statements.
+
+    Args:
+        raw: Raw script line
+        pure: True for a parser in pure mode
+
+    Returns:
+        True if the line begins a top-level statement
+    """
+    if not raw or raw[0] == ' ':
+        return False
+    line = raw.strip()
+    if not line or line.startswith('#'):
+        return False
+    if line.startswith('$') and '=' in line:
+        return pure or line.split('=', 1)[1].strip().startswith('input,')
+    return line.split(',', 1)[0].strip().lower() not in CONTINUATION_COMMANDS
+
 
 class ScriptParser:
     """Parses macro scripts into executable action trees"""
 
-    def __init__(self, context):
+    def __init__(self, context=None, pure=False):
         """
         Initialize parser
 
+        In pure mode the parser has no side effects: declarations become
+        ('ASSIGN', name, expr, line_num) actions evaluated by the executor,
+        and functions go to the parser's own table instead of the context.
+        The same script then always yields the same result.
+
         Args:
             context: ExecutionContext instance for variable storage
+                (optional in pure mode)
+            pure: Enable side-effect-free parsing
         """
         self.context = context
+        self.pure = pure
+        self.functions = {} if pure else context.functions
+        self.stray_end_line = None    # Line of an unmatched top-level end marker
+        self.hoisted = set()          # Functions declared anywhere in the script
+        self.recover = False          # Collect diagnostics instead of raising
+        self.diagnostics = []
 
     def parse(self, script):
         """
@@ -26,13 +111,37 @@ class ScriptParser:
             script: Script text to parse
 
         Returns:
-            List of actions (action tree)
+            List of actions (action tree); in pure mode the functions it
+            defines are in self.functions
+        """
+        self._reset_functions()
+        self.stray_end_line = None
+        self.diagnostics = []
+        lines = self._prepare_lines(script.splitlines())
+
+        # Functions can be called before their definition
+        self.hoisted = self.declared_functions(lines)
+
+        # Second pass: build action tree
+        actions, _ = self._parse_block(lines, 0, 0)
+        return actions
+
+    def _prepare_lines(self, raw_lines, first_line_num=1, assignments=None):
+        """
+        First pass: extract variables and prepare lines
+
+        Args:
+            raw_lines: List of raw script lines
+            first_line_num: Line number of raw_lines[0]
+            assignments: Optional list; when given, (name, expr) pairs are
+                appended to it instead of being evaluated
+
+        Returns:
+            List of (indent, line, line_num) tuples
         """
-        raw_lines = script.splitlines()
         lines = []
 
-        # First pass: extract variables and prepare lines
-        for line_num, raw in enumerate(raw_lines, 1):
+        for line_num, raw in enumerate(raw_lines, first_line_num):
             if not raw.strip() or raw.strip().startswith('#'):
                 continue
 
@@ -54,21 +163,59 @@ class ScriptParser:
                         lines.append((indent, action_line, line_num))
                     continue
 
-                # Evaluate expression with known variables
-                try:
-                    value = safe_eval_expr(expr, self.context.variables)
-                    self.context.set_variable(name, value)
-                except Exception:
-                    # If evaluation fails, store as string
-                    self.context.set_variable(name, expr)
+                if self.pure:
+                    # Kept as a statement, see _parse_block
+                    lines.append((indent, line, line_num))
+                elif assignments is not None:
+                    assignments.append((name, expr))
+                else:
+                    self.assign_variable(name, expr)
                 continue
 
             # Add line with line number for debug tracking
             lines.append((indent, line, line_num))
 
-        # Second pass: build action tree
-        actions, _ = self._parse_block(lines, 0, 0)
-        return actions
+        return lines
+
+    @staticmethod
+    def declared_functions(lines):
+        """
+        Collect the names of the functions defined in prepared lines
+
+        Args:
+            lines: List of (indent, line, line_num) tuples
+
+        Returns:
+            Set of function names
+        """
+        names = set()
+        for _, line, _ in lines:
+            parts = line.split(',')
+            if len(parts) > 1 and parts[0].strip().lower() == 'function':
+                name = parts[1].strip().replace('()', '')
+                if name:
+                    names.add(name)
+        return names
+
+    def _reset_functions(self):
+        """Point the function table at the context, or start a new one in pure mode"""
+        self.functions = {} if self.pure else self.context.functions
+
+    def assign_variable(self, name, expr):
+        """
+        Evaluate a variable declaration into the context
+
+        Args:
+            name: Variable name (with $)
+            expr: Expression text
+        """
+        # Evaluate expression with known variables
+        try:
+            value = safe_eval_expr(expr, self.context.variables)
+            self.context.set_variable(name, value)
+        except Exception:
+            # If evaluation fails, store as string
+            self.context.set_variable(name, expr)
 
     def _parse_block(self, lines, start, base_indent):
         """
@@ -95,6 +242,15 @@ class ScriptParser:
             parts = [p.strip() for p in line.split(',')]
             cmd = parts[0].lower()
 
+            # An end marker reaching the top level stops the whole parse
+            if base_indent == 0 and cmd in END_COMMANDS:
+                if self.recover:
+                    self._report(Diagnostic.UNMATCHED_END, f"Unmatched '{cmd}'",
+                                 line_num, indent, indent + len(line))
+                    i += 1
+                    continue
+                self.stray_end_line = line_num
+
             # LOOP command
             if cmd == 'loop':
                 loop_count = parts[1] if len(parts) > 1 else '1'
@@ -113,7 +269,7 @@ class ScriptParser:
 
                 block, new_i = self._parse_block(lines, i + 1, indent + 1)
                 actions.append(('LOOP', count, block, line_num))
-                i = new_i
+                i = self._skip_end_marker(lines, new_i, indent, ('endloop', 'next'))
 
             # END LOOP markers
             elif cmd in ['endloop', 'next']:
@@ -123,11 +279,13 @@ class ScriptParser:
             elif cmd == 'while':
                 cond = ','.join(parts[1:]).strip()
                 if not cond:
-                    raise SyntaxError(f"While requires a condition at line {line_num}")
+                    self._report(Diagnostic.MISSING_CONDITION, "While requires a condition",
+                                 line_num, indent, indent + len(line))
 
                 block, new_i = self._parse_block(lines, i + 1, indent + 1)
-                actions.append(('WHILE', cond, block, line_num))
-                i = new_i
+                if cond:
+                    actions.append(('WHILE', cond, block, line_num))
+                i = self._skip_end_marker(lines, new_i, indent, ('endwhile',))
 
             # END WHILE marker
             elif cmd == 'endwhile':
@@ -138,7 +296,8 @@ class ScriptParser:
                 branches = []  # List of (condition, block) tuples
                 cond = ','.join(parts[1:]).strip()
                 if not cond:
-                    raise SyntaxError(f"If requires a condition at line {line_num}")
+                    self._report(Diagnostic.MISSING_CONDITION, "If requires a condition",
+                                 line_num, indent, indent + len(line))
 
                 # Parse first if block
                 block, new_i = self._parse_block(lines, i + 1, indent + 1)
@@ -171,7 +330,8 @@ class ScriptParser:
                     else:
                         break
 
-                actions.append(('IF', branches, line_num))
+                if cond:
+                    actions.append(('IF', branches, line_num))
 
             # END IF marker
             elif cmd == 'endif':
@@ -181,18 +341,20 @@ class ScriptParser:
             elif cmd == 'function':
                 func_name = parts[1] if len(parts) > 1 else None
                 if not func_name:
-                    raise SyntaxError(f"Function requires a name at line {line_num}")
-
-                # Remove parentheses if present (e.g., "heal()" -> "heal")
-                func_name = func_name.replace('()', '')
+                    self._report(Diagnostic.MISSING_NAME, "Function requires a name",
+                                 line_num, indent, indent + len(line))
+                else:
+                    # Remove parentheses if present (e.g., "heal()" -> "heal")
+                    func_name = func_name.replace('()', '')
 
                 # Parse function body
                 func_body, new_i = self._parse_block(lines, i + 1, indent + 1)
 
-                # Register function in context
-                self.context.register_function(func_name, func_body)
+                # Register function (in context unless pure)
+                if func_name:
+                    self.functions[func_name] = func_body
 
-                i = new_i
+                i = self._skip_end_marker(lines, new_i, indent, ('endfunction',))
 
             # END FUNCTION marker
             elif cmd == 'endfunction':
@@ -213,13 +375,23 @@ class ScriptParser:
                 actions.append(('BREAKPOINT', line_num))
                 i += 1
 
+            # Variable declaration (only reaches here in pure mode)
+            elif line.startswith('$') and '=' in line:
+                name, expr = line.split('=', 1)
+                actions.append(('ASSIGN', name.strip(), expr.strip(), line_num))
+                i += 1
+
             # Function call (detect by presence of parentheses)
             elif '(' in line and ')' in line:
                 func_name = line.split('(')[0].strip()
-                # Check if function exists
-                if self.context.get_function(func_name):
+                # Check if function exists (declared anywhere, or already known)
+                if func_name in self.hoisted or self.functions.get(func_name):
                     actions.append(('CALL_FUNCTION', func_name, line_num))
                     i += 1
+                elif CALL_PATTERN.match(line):
+                    self._report(Diagnostic.UNKNOWN_FUNCTION, f"Unknown function '{func_name}'",
+                                 line_num, indent, indent + len(func_name))
+                    i += 1
                 else:
                     # Not a function call, treat as regular action
                     actions.append((line, line_num))
@@ -232,6 +404,68 @@ class ScriptParser:
 
         return actions, i
 
+    def _report(self, code, message, line_num, col_start, col_end):
+        """
+        Report a syntax error
+
+        Args:
+            code: Diagnostic code
+            message: Message without location
+            line_num: Line number
+            col_start: First column of the faulty text
+            col_end: Column right after the faulty text
+
+        Raises:
+            SyntaxError: Unless the parser is in recovering mode
+        """
+        diagnostic = Diagnostic(line_num, col_start, col_end, code, message)
+        if not self.recover:
+            raise SyntaxError(str(diagnostic))
+        self.diagnostics.append(diagnostic)
+
+    def _skip_end_marker(self, lines, i, indent, markers):
+        """
+        Consume a block's end marker written at the opener's indentation
+
+        Markers indented inside the block are already consumed by
+        _parse_block; one aligned with the opener (the documented style)
+        is left for the caller and must not end the enclosing block.
+
+        Args:
+            lines: List of (indent, line, line_num) tuples
+            i: Index right after the block body
+            indent: Indentation of the block opener
+            markers: Accepted end marker commands
+
+        Returns:
+            Index of the next statement
+        """
+        if i < len(lines):
+            end_indent, end_line, _ = lines[i]
+            if end_indent == indent and end_line.split(',')[0].strip().lower() in markers:
+                return i + 1
+        return i
+
+    def check(self, script):
+        """
+        Collect every syntax problem of a script in one pass
+
+        The parser recovers after each error (skipping the faulty statement
+        but still reading its block) instead of stopping at the first one.
+
+        Args:
+            script: Script text to check
+
+        Returns:
+            List of Diagnostic objects, in line order
+        """
+        self.recover = True
+        try:
+            self.parse(script)
+        finally:
+            self.recover = False
+        return sorted(self.diagnostics, key=lambda d: (d.line, d.col_start))
+
     def validate_syntax(self, script):
         """
         Validate script syntax without executing
@@ -240,12 +474,13 @@ class ScriptParser:
             script: Script text to validate
 
         Returns:
-            Tuple of (is_valid, error_message)
+            Tuple of (is_valid, error_message) with the first error found
         """
         try:
-            self.parse(script)
-            return (True, "Syntax OK")
-        except SyntaxError as e:
-            return (False, str(e))
+            diagnostics = self.check(script)
         except Exception as e:
             return (False, f"Validation error: {e}")
+
+        if diagnostics:
+            return (False, str(diagnostics[0]))
+        return (True, "Syntax OK")
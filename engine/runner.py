@@ -0,0 +1,236 @@
+"""
+Headless Runner Module
+Runs a macro file from the command line, without the IDE
+Only the engine, commands and utils modules are imported (no Qt)
+
+Usage:
+    python -m engine.runner macro.txt [--speed 2] [--iterations 3]
+    python -m engine.runner macro.txt --simulate [--max-time 28800]
+    python -m engine.runner recording.txt --stream
+
+With --simulate nothing is sent to the keyboard or mouse and nothing
+sleeps: timed commands advance a virtual clock and the input events are
+printed with their simulated timestamps.
+
+Files of STREAM_THRESHOLD bytes or more (or any file with --stream) are
+parsed and run chunk by chunk instead of being loaded whole.
+"""
+import argparse
+import os
+import sys
+import threading
+from commands.backend import FakeBackend
+from engine.cache import CompiledFileCache, ParseCache
+from engine.compiler import MacroCompiler
+from engine.context import ExecutionContext
+from engine.executor import MacroExecutor
+from engine.optimizer import MacroOptimizer
+from engine.parser import ScriptParser
+from engine.streaming import StreamingParser
+from utils.file_io import FileManager
+from utils.screen import ScreenGeometry, system_screen_size
+from utils.timing import VirtualClock
+
+# Size from which a macro file is streamed instead of loaded whole (bytes)
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+
+def parse_screen_size(text):
+    """
+    Parse a WIDTHxHEIGHT screen size
+
+    Args:
+        text: Size text, e.g. "1920x1080"
+
+    Returns:
+        Tuple of (width, height)
+    """
+    try:
+        width, height = text.lower().split('x')
+        return (int(width), int(height))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid screen size '{text}' (expected WIDTHxHEIGHT)")
+
+
+def build_arg_parser():
+    """
+    Build the command-line parser
+
+    Returns:
+        argparse.ArgumentParser
+    """
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m engine.runner',
+        description="Run a macro file without the IDE")
+    arg_parser.add_argument('file', help="Macro file (.txt or .json)")
+    arg_parser.add_argument('-s', '--speed', type=float, default=None,
+                            help="Speed multiplier (default: from the file, else 1.0)")
+    arg_parser.add_argument('-n', '--iterations', type=int, default=None,
+                            help="Number of runs (default: from the file, else 1)")
+    arg_parser.add_argument('--screen', type=parse_screen_size, default=None,
+                            metavar='WxH',
+                            help="Screen size for $screen_width/$screen_height "
+                                 "(default: read from the system)")
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help="Do not read or write compiled .mbc files")
+    arg_parser.add_argument('--stream', action='store_true', default=None,
+                            help="Parse and run the file chunk by chunk (automatic for "
+                                 "files of 16 MB or more)")
+    arg_parser.add_argument('--simulate', action='store_true',
+                            help="Run on a virtual clock without real input and print "
+                                 "the timestamped event stream")
+    arg_parser.add_argument('--max-time', type=float, default=None, metavar='SECONDS',
+                            help="With --simulate, stop once the virtual clock passes SECONDS")
+    return arg_parser
+
+
+def run_file(filepath, speed=None, iterations=None, use_cache=True, log_callback=print,
+             backend=None, clock=None, time_limit=None, stream=None):
+    """
+    Load, compile and run a macro file
+
+    The macro runs in a worker thread, as in the IDE; Ctrl+C stops it
+    like the Stop button.
+
+    Args:
+        filepath: Path to the macro file
+        speed: Speed multiplier, or None to use the file's
+        iterations: Number of runs, or None to use the file's
+        use_cache: Read and write the compiled .mbc file
+        log_callback: Logging callback
+        backend: Optional InputBackend (default: pynput)
+        clock: Optional VirtualClock to simulate the macro on
+        time_limit: With a clock, stop the macro at the first command
+            logged once the clock has passed this time (seconds)
+        stream: Parse and run the file chunk by chunk (see StreamingParser);
+            None streams files of STREAM_THRESHOLD bytes or more. Syntax
+            errors are then reported when the chunk holding them is reached,
+            after the chunks before it have run, and the status is 1
+
+    Returns:
+        Exit status: 0 when the macro ran, 1 on errors, 130 if interrupted
+    """
+    context = ExecutionContext(input_backend=backend)
+    parser = ScriptParser(context, pure=True)
+    parse_cache = ParseCache(compiler=MacroCompiler(), optimizer=MacroOptimizer(), compact=True)
+
+    try:
+        if stream is None:
+            stream = os.path.getsize(filepath) >= STREAM_THRESHOLD
+        if stream:
+            file_speed, file_iterations = 1.0, 1
+            if FileManager.detect_format(filepath) == 'json':
+                data = FileManager.load_json(filepath)
+                file_speed = data.get('speed', 1.0)
+                file_iterations = data.get('metadata', {}).get('iterations', 1)
+            actions = None
+        else:
+            if use_cache:
+                script, file_speed, file_iterations, _ = CompiledFileCache(parse_cache).load_file(
+                    filepath, parser)
+            else:
+                script, file_speed, file_iterations, _ = FileManager.load_file(filepath)
+            actions, _ = parse_cache.parse(parser, script)
+    except (OSError, ValueError) as e:
+        log_callback(f"[ERREUR] {filepath}: {e}")
+        return 1
+    except SyntaxError as e:
+        log_callback(f"[ERREUR] {e}")
+        return 1
+
+    speed = file_speed if speed is None else speed
+    iterations = file_iterations if iterations is None else iterations
+
+    executor = MacroExecutor(context, clock=clock)
+    context.set_special_var('@iterations', iterations)
+
+    if clock is not None and time_limit is not None:
+        log_output = log_callback
+
+        def log_callback(message):
+            log_output(message)
+            if clock() >= time_limit and not executor.stop_event.is_set():
+                executor.stop()
+
+    failed = False
+
+    def run_macro():
+        nonlocal failed
+        for i in range(iterations):
+            if executor.stop_event.is_set():
+                break
+            if iterations > 1:
+                log_callback(f"=== Itération {i+1}/{iterations} ===")
+            if actions is None:
+                stream_parser = StreamingParser(context, MacroCompiler(), compact=True)
+                chunks = stream_parser.iter_chunks(lambda: FileManager.iter_lines(filepath))
+                if not executor.execute_chunks(chunks, speed, log_callback):
+                    failed = True
+                    break
+            else:
+                executor.execute(actions, speed, log_callback)
+
+    worker = threading.Thread(target=run_macro, daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        executor.stop()
+        log_callback("⏹ Arrêt demandé")
+        worker.join()
+        return 130
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """
+    Command-line entry point
+
+    Args:
+        argv: Argument list (default: sys.argv[1:])
+
+    Returns:
+        Exit status
+    """
+    args = build_arg_parser().parse_args(argv)
+
+    if args.screen:
+        size = args.screen
+        ScreenGeometry.set_backend(lambda: size)
+    else:
+        # No Qt application here: ask the system
+        ScreenGeometry.set_backend(system_screen_size)
+
+    if not args.simulate:
+        def log(message):
+            print(message, flush=True)
+
+        return run_file(args.file, args.speed, args.iterations, use_cache=not args.no_cache,
+                        log_callback=log, stream=args.stream)
+
+    # Simulation: input events and log lines in time order, on the virtual clock
+    clock = VirtualClock()
+    backend = FakeBackend(clock=clock, screen_size=args.screen or (1920, 1080))
+    printed = 0
+
+    def flush_events():
+        nonlocal printed
+        lines = backend.format_events(printed)
+        for line in lines:
+            print(line)
+        printed += len(lines)
+
+    def log(message):
+        flush_events()
+        print(f"{clock():9.3f}s  # {message}", flush=True)
+
+    status = run_file(args.file, args.speed, args.iterations, use_cache=not args.no_cache,
+                      log_callback=log, backend=backend, clock=clock, time_limit=args.max_time,
+                      stream=args.stream)
+    flush_events()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Streaming Parser Module
+Parses and compiles scripts chunk by chunk from a line iterator
+Memory stays bounded by the chunk size instead of the script size
+"""
+from engine.compact import pack_actions
+from engine.parser import ScriptParser, starts_statement
+
+
+def _defines_function(raw):
+    """Check whether a raw line starts a function definition"""
+    return raw.strip().split(',', 1)[0].strip().lower() == 'function'
+
+
+class StreamingParser(ScriptParser):
+    """Pure ScriptParser that yields compiled chunks of top-level statements"""
+
+    def __init__(self, context=None, compiler=None, chunk_lines=2000, compact=False):
+        """
+        Initialize streaming parser
+
+        The parser always runs in pure mode: declarations are evaluated in
+        order by the executor, so chunks can be parsed independently.
+
+        Args:
+            context: Optional ExecutionContext; functions are registered in
+                it before the first chunk is yielded
+            compiler: Optional MacroCompiler used on each chunk
+            chunk_lines: Approximate number of raw lines per chunk
+            compact: Pack long runs of simple commands into typed arrays
+                (see engine.compact); requires a compiler
+        """
+        super().__init__(context, pure=True)
+        self.compiler = compiler
+        self.chunk_lines = chunk_lines
+        self.compact = compact
+
+    def iter_chunks(self, open_lines):
+        """
+        Parse a script from an iterator of lines
+
+        The lines are read twice. A first pass keeps only the top-level
+        statements that contain a function definition, which are parsed
+        and compiled before anything else, so calls may come before the
+        definition as in a full parse. The second pass groups all the
+        top-level statements until about chunk_lines raw lines are
+        collected, then parses, compiles and yields them, linking calls
+        to the functions of the first pass. Only the current chunk and
+        the function bodies are in memory.
+
+        Calls to unknown functions are reported like in a full parse; the
+        result never depends on chunk_lines. A statement is never split,
+        so a single block spanning the whole file is read at once.
+
+        Args:
+            open_lines: Callable returning a new iterable of raw script
+                lines each time (e.g. lambda: FileManager.iter_lines(path))
+
+        Yields:
+            Lists of actions, in script order
+
+        Raises:
+            SyntaxError: When the chunk containing the error is reached
+                (errors in statements defining functions are raised before
+                the first chunk)
+        """
+        self._reset_functions()
+        self.stray_end_line = None
+        self.diagnostics = []
+
+        # First pass: statements defining functions
+        definitions = []
+        for line_num, raw in self._statements(open_lines()):
+            if any(_defines_function(line) for line in raw):
+                definitions.extend(self._prepare_lines(raw, line_num))
+        compiled = self._parse_functions(definitions)
+        self.stray_end_line = None
+
+        # Second pass: every statement, in order
+        batch = []
+        first_line_num = 1
+        for line_num, raw in self._statements(open_lines()):
+            if len(batch) >= self.chunk_lines:
+                yield self._parse_chunk(self._prepare_lines(batch, first_line_num), compiled)
+                if self.stray_end_line is not None:
+                    return
+                batch = []
+                first_line_num = line_num
+            batch.extend(raw)
+
+        if batch:
+            yield self._parse_chunk(self._prepare_lines(batch, first_line_num), compiled)
+
+    def _statements(self, lines):
+        """
+        Group raw lines into top-level statements
+
+        Args:
+            lines: Iterable of raw script lines
+
+        Yields:
+            Tuples of (first line number, list of raw lines)
+        """
+        statement = []
+        first_line_num = 1
+
+        for line_num, raw in enumerate(lines, 1):
+            if starts_statement(raw, self.pure) and statement:
+                yield first_line_num, statement
+                statement = []
+                first_line_num = line_num
+            statement.append(raw)
+
+        if statement:
+            yield first_line_num, statement
+
+    def _parse_functions(self, lines):
+        """
+        Parse and compile the function definitions of prepared lines
+
+        The other actions of these lines are dropped: the second pass
+        parses them again in order. Diagnostics are reported there too,
+        so the ones found here are not kept.
+
+        Args:
+            lines: List of (indent, line, line_num) tuples
+
+        Returns:
+            Dict of compiled function bodies
+        """
+        self.hoisted = self.declared_functions(lines)
+        diagnostics = self.diagnostics
+        self.diagnostics = []
+        try:
+            self._parse_block(lines, 0, 0)
+        finally:
+            self.diagnostics = diagnostics
+
+        functions = self.functions
+        if self.compiler:
+            self.compiler.compile([], functions)
+            if self.compact:
+                pack_actions([], functions)
+
+        if self.context is not None:
+            self.context.functions.update(functions)
+        return functions
+
+    def _parse_chunk(self, lines, compiled):
+        """
+        Parse and compile prepared lines of complete top-level statements
+
+        Functions defined in the lines were already compiled by the first
+        pass; calls link to those bodies, and self.hoisted still holds the
+        names declared in the whole script.
+
+        Args:
+            lines: List of (indent, line, line_num) tuples
+            compiled: Dict of compiled function bodies
+
+        Returns:
+            List of actions
+        """
+        self.functions = {}
+        try:
+            actions, _ = self._parse_block(lines, 0, 0)
+        finally:
+            self.functions = compiled
+
+        if self.compiler:
+            actions = self.compiler.compile(actions, None, compiled)
+            if self.compact:
+                actions = pack_actions(actions)
+        return actions
@@ -0,0 +1,92 @@
+"""
+Variable Template Module
+Splits text into literal pieces and variable slots once, renders by lookup
+"""
+import re
+from functools import lru_cache
+
+# Variable references that must be substituted at runtime ($name, @name)
+VAR_REF_PATTERN = re.compile(r'[$@][A-Za-z_]\w*')
+
+# Marks a variable missing from every scope
+MISSING = object()
+
+# Variables stored in scope frames (loop counters), by slot index
+FRAME_SLOTS = {'$i': 0}
+
+
+class VariableTemplate:
+    """Text with its variable references resolved into slots"""
+
+    __slots__ = ('text', 'pieces', 'positions', 'names', 'frame_slots')
+
+    def __init__(self, text):
+        """
+        Tokenize a text
+
+        A reference is the longest $name/@name at its position, so '$index'
+        is never read as '$i' followed by 'ndex'.
+
+        Args:
+            text: Text containing variable references
+        """
+        self.text = text
+        pieces = []
+        positions = []
+        last = 0
+        for match in VAR_REF_PATTERN.finditer(text):
+            pieces.append(text[last:match.start()])
+            positions.append(len(pieces))
+            pieces.append(match.group(0))
+            last = match.end()
+        pieces.append(text[last:])
+
+        self.pieces = tuple(pieces)
+        self.positions = tuple(positions)        # Indexes of the slots in pieces
+        self.names = tuple(dict.fromkeys(pieces[idx] for idx in positions))
+        # Frame slot of each reference (None: resolved by name)
+        self.frame_slots = tuple(FRAME_SLOTS.get(pieces[idx]) for idx in positions)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def parse(text):
+        """
+        Get the (shared) template of a text
+
+        Args:
+            text: Text containing variable references
+
+        Returns:
+            VariableTemplate instance
+        """
+        return VariableTemplate(text)
+
+    def render(self, context):
+        """
+        Substitute the variables with their current values
+
+        References to undefined variables are left as they are.
+
+        Args:
+            context: ExecutionContext providing lookup_variable()
+
+        Returns:
+            Rendered string
+        """
+        if not self.positions:
+            return self.text
+
+        pieces = list(self.pieces)
+        lookup = context.lookup_variable
+        frame = context.frame
+        for idx, slot in zip(self.positions, self.frame_slots):
+            if slot is not None and frame is not None and frame[slot] is not MISSING:
+                value = frame[slot]
+            else:
+                value = lookup(pieces[idx], MISSING)
+            if value is not MISSING:
+                pieces[idx] = str(value)
+        return ''.join(pieces)
+
+    def __repr__(self):
+        return f"VariableTemplate({self.text!r})"
@@ -18,7 +18,8 @@ class MacroValidator(QObject):
 
         Args:
             editor: QScintilla editor instance
-            parser: ScriptParser instance
+            parser: ScriptParser instance (an IncrementalParser keeps
+                re-validation proportional to the edit)
         """
         super().__init__()
         self.editor = editor
@@ -61,71 +62,71 @@ class MacroValidator(QObject):
             return  # Don't validate empty code
 
         try:
-            # Use existing parser to validate
-            is_valid, message = self.parser.validate_syntax(code)
-
-            if not is_valid:
-                # Try to extract line number from error message
-                self._highlight_error_from_message(message)
-
-        except SyntaxError as e:
-            # Highlight error location if available
-            if hasattr(e, 'lineno') and e.lineno:
-                self._highlight_error_line(e.lineno, str(e))
-
+            # One recovering pass reports every error with its location
+            diagnostics = self.parser.check(code)
         except Exception:
             # Silently ignore other exceptions during validation
-            pass
+            return
 
-    def _highlight_error_from_message(self, message):
-        """
-        Extract line number from error message and highlight
+        # Group messages per line for annotations
+        messages = {}
+        for diagnostic in diagnostics:
+            self._highlight_diagnostic(diagnostic)
+            messages.setdefault(diagnostic.line, []).append(str(diagnostic))
 
-        Args:
-            message: Error message string
-        """
-        # Try to extract line number from common error message patterns
-        import re
-        match = re.search(r'line (\d+)', message, re.IGNORECASE)
-
-        if match:
-            line_num = int(match.group(1))
-            self._highlight_error_line(line_num, message)
-        else:
-            # If no line number found, highlight first line
-            self._highlight_error_line(1, message)
-
-    def _highlight_error_line(self, line_num, error_msg):
+        for line_num, line_messages in messages.items():
+            self._annotate_line(line_num, "\n".join(line_messages))
+
+    def _clamp_line(self, line_num):
         """
-        Highlight a specific line with error
+        Convert a 1-indexed line number to a valid 0-indexed editor line
 
         Args:
             line_num: Line number (1-indexed)
-            error_msg: Error message to display
+
+        Returns:
+            Editor line index
         """
-        # Convert to 0-indexed
         line = line_num - 1
-
-        # Ensure line is valid
-        if line < 0:
-            line = 0
         if line >= self.editor.lines():
             line = self.editor.lines() - 1
+        if line < 0:
+            line = 0
+        return line
+
+    def _highlight_diagnostic(self, diagnostic):
+        """
+        Underline the text a diagnostic points at
 
-        # Get line length
+        Args:
+            diagnostic: Diagnostic from the parser
+        """
+        line = self._clamp_line(diagnostic.line)
         line_length = self.editor.lineLength(line)
 
         if line_length > 0:
-            # Highlight the entire line
+            col_end = min(diagnostic.col_end, line_length)
+            col_start = min(diagnostic.col_start, col_end)
+            if col_start == col_end:
+                # Nothing to point at: highlight the entire line
+                col_start, col_end = 0, line_length
             self.editor.fillIndicatorRange(
-                line, 0,
-                line, line_length,
+                line, col_start,
+                line, col_end,
                 self.ERROR_INDICATOR
             )
 
-            # Add annotation with error message
-            self.editor.annotate(line, error_msg, self.editor.annotationDisplay())
-            self.editor.setAnnotationDisplay(QsciScintilla.AnnotationBoxed)
+    def _annotate_line(self, line_num, error_msg):
+        """
+        Display error messages below a line
+
+        Args:
+            line_num: Line number (1-indexed)
+            error_msg: Error message(s) to display
+        """
+        line = self._clamp_line(line_num)
+        self.editor.annotate(line, error_msg, self.editor.annotationDisplay())
+        self.editor.setAnnotationDisplay(QsciScintilla.AnnotationBoxed)
 
     def disable(self):
         """Disable validation (useful during macro execution)"""
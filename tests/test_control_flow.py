@@ -0,0 +1,223 @@
+"""
+Control Flow Tests
+break/continue inside if blocks, loops, while loops and functions
+Each script runs on a FakeBackend and a VirtualClock, with and without
+the optimizer
+"""
+import pytest
+from commands.backend import FakeBackend
+from engine.compiler import MacroCompiler
+from engine.context import ExecutionContext
+from engine.executor import MacroExecutor
+from engine.optimizer import MacroOptimizer
+from engine.parser import ScriptParser
+from utils.timing import VirtualClock
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'optimized'])
+def optimize(request):
+    return request.param
+
+
+def run_script(script, optimize, last="✅ Macro terminée"):
+    """
+    Parse, compile and run a script without real input or sleeping
+
+    Args:
+        script: Script text
+        optimize: Run the MacroOptimizer on the compiled tree
+        last: Expected last log message
+
+    Returns:
+        Tuple of (echoed messages, FakeBackend)
+    """
+    clock = VirtualClock()
+    backend = FakeBackend(clock=clock)
+    context = ExecutionContext(input_backend=backend)
+    parser = ScriptParser(context, pure=True)
+
+    actions = parser.parse(script)
+    functions = dict(parser.functions)
+    actions = MacroCompiler().compile(actions, functions)
+    if optimize:
+        actions = MacroOptimizer().optimize(actions, functions, {})
+    context.functions.update(functions)
+
+    log = []
+    MacroExecutor(context, clock=clock).execute(actions, 1.0, log.append)
+    assert log[-1] == last, log
+    if last == "✅ Macro terminée":
+        assert not [message for message in log if message.startswith('[ERREUR')], log
+    echoes = [message[len('[ECHO] '):] for message in log if message.startswith('[ECHO] ')]
+    return echoes, backend
+
+
+def test_break_in_if_leaves_loop(optimize):
+    echoes, _ = run_script("""
+loop,5
+    if,$i == 2
+        break
+    endif
+    echo,$i
+endloop
+echo,done
+""", optimize)
+    assert echoes == ['0', '1', 'done']
+
+
+def test_continue_in_if_skips_rest_of_loop_body(optimize):
+    echoes, _ = run_script("""
+loop,4
+    if,$i == 1
+        continue
+    endif
+    echo,$i
+endloop
+""", optimize)
+    assert echoes == ['0', '2', '3']
+
+
+def test_break_in_if_leaves_while(optimize):
+    echoes, _ = run_script("""
+$n = 0
+while,$n < 10
+    $n = $n + 1
+    if,$n == 3
+        break
+    endif
+    echo,$n
+endwhile
+echo,done
+""", optimize)
+    assert echoes == ['1', '2', 'done']
+
+
+def test_continue_in_if_skips_rest_of_while_body(optimize):
+    echoes, _ = run_script("""
+$n = 0
+while,$n < 5
+    $n = $n + 1
+    if,$n == 2
+        continue
+    endif
+    echo,$n
+endwhile
+""", optimize)
+    assert echoes == ['1', '3', '4', '5']
+
+
+def test_break_in_nested_if(optimize):
+    echoes, _ = run_script("""
+loop,5
+    if,$i >= 1
+        if,$i == 3
+            break
+        endif
+    endif
+    echo,$i
+endloop
+""", optimize)
+    assert echoes == ['0', '1', '2']
+
+
+def test_break_in_inner_loop_keeps_outer_loop(optimize):
+    echoes, _ = run_script("""
+loop,2
+    loop,3
+        if,$i == 1
+            break
+        endif
+        echo,inner $i
+    endloop
+    echo,outer $i
+endloop
+""", optimize)
+    assert echoes == ['inner 0', 'outer 0', 'inner 0', 'outer 1']
+
+
+def test_continue_in_inner_loop_restores_outer_counter(optimize):
+    echoes, _ = run_script("""
+loop,2
+    loop,3
+        if,$i != 2
+            continue
+        endif
+        echo,inner $i
+    endloop
+    echo,outer $i
+endloop
+""", optimize)
+    assert echoes == ['inner 2', 'outer 0', 'inner 2', 'outer 1']
+
+
+def test_break_in_function_ends_function_only(optimize):
+    echoes, _ = run_script("""
+function,step
+    if,$i == 1
+        break
+    endif
+    echo,step $i
+endfunction
+loop,3
+    step()
+    echo,after $i
+endloop
+""", optimize)
+    assert echoes == ['step 0', 'after 0', 'after 1', 'step 2', 'after 2']
+
+
+def test_top_level_break_ends_macro(optimize):
+    echoes, backend = run_script("""
+press,a,0.5
+if,1 == 1
+    break
+endif
+press,b,0.5
+echo,unreachable
+""", optimize)
+    assert echoes == []
+    assert backend.format_events() == ['    0.000s  key_down a', '    0.500s  key_up a']
+
+
+def test_loop_control_timing(optimize):
+    _, backend = run_script("""
+loop,4
+    if,$i == 1
+        continue
+    endif
+    if,$i == 3
+        break
+    endif
+    press,x,0.25
+endloop
+""", optimize)
+    downs = [t for t, event, _ in backend.events if event == 'key_down']
+    assert downs == [0.0, 0.25]
+
+
+def test_runaway_recursion_stops_run(optimize):
+    echoes, _ = run_script("""
+function,ping
+    echo,ping
+    pong()
+endfunction
+function,pong
+    ping()
+endfunction
+ping()
+echo,unreachable
+""", optimize, last="⏹ Macro arrêtée")
+    assert echoes == ['ping'] * 500
+
+
+def test_call_function_with_empty_body(optimize):
+    echoes, _ = run_script("""
+function,noop
+    if,1 == 0
+        echo,never
+    endif
+endfunction
+noop()
+echo,after
+""", optimize)
+    assert echoes == ['after']
@@ -0,0 +1,101 @@
+"""
+Streaming Parser Tests
+StreamingParser must run a script exactly like a full parse, whatever
+the chunk size
+"""
+import pytest
+from commands.backend import FakeBackend
+from engine.compiler import MacroCompiler
+from engine.context import ExecutionContext
+from engine.executor import MacroExecutor
+from engine.parser import ScriptParser
+from engine.streaming import StreamingParser
+from utils.timing import VirtualClock
+
+SCRIPTS = {
+    'statements_between_functions': """
+echo,start
+function,f
+    echo,in f
+endfunction
+echo,between
+$x = 2
+function,g
+    echo,in g $x
+    f()
+endfunction
+g()
+echo,end
+""",
+    'indented_lines_after_endfunction': """
+function,f
+    echo,in f
+endfunction
+    echo,tail of f
+    f()
+function,g
+    echo,in g
+    endfunction
+    echo,tail of g
+g()
+""",
+    'calls_before_definitions': """
+loop,2
+    f()
+endloop
+function,f
+    echo,f $i
+    g()
+endfunction
+  echo,indented
+function,g
+    echo,g
+endfunction
+""",
+}
+
+
+def make_executor():
+    """Build an executor on a FakeBackend and a VirtualClock"""
+    clock = VirtualClock()
+    context = ExecutionContext(input_backend=FakeBackend(clock=clock))
+    return MacroExecutor(context, clock=clock)
+
+
+def run_full(script):
+    """Parse the whole script at once and run it, returning the log"""
+    executor = make_executor()
+    parser = ScriptParser(executor.context, pure=True)
+    actions = parser.parse(script)
+    functions = dict(parser.functions)
+    actions = MacroCompiler().compile(actions, functions)
+    executor.context.functions.update(functions)
+
+    log = []
+    executor.execute(actions, 1.0, log.append)
+    return log
+
+
+def run_streamed(script, chunk_lines):
+    """Parse and run the script chunk by chunk, returning the log"""
+    executor = make_executor()
+    parser = StreamingParser(executor.context, MacroCompiler(), chunk_lines=chunk_lines)
+    lines = script.splitlines()
+
+    log = []
+    executor.execute_chunks(parser.iter_chunks(lambda: iter(lines)), 1.0, log.append)
+    return log
+
+
+@pytest.mark.parametrize('chunk_lines', [1, 3, 2000])
+@pytest.mark.parametrize('name', sorted(SCRIPTS))
+def test_streaming_matches_full_parse(name, chunk_lines):
+    script = SCRIPTS[name]
+    expected = run_full(script)
+    assert expected[-1] == "✅ Macro terminée", expected
+    assert run_streamed(script, chunk_lines) == expected
+
+
+def test_unknown_function_is_reported():
+    log = run_streamed("echo,hi\nnosuch()\n", chunk_lines=1)
+    assert log[-1] == "[ERREUR GLOBALE] Unknown function 'nosuch' at line 2"
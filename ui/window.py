@@ -12,9 +12,14 @@ from ui.editor import MacroEditor
 from ui.controls import ControlPanel
 from engine.context import ExecutionContext
 from engine.parser import ScriptParser
+from engine.incremental import IncrementalParser
+from engine.compiler import MacroCompiler
+from engine.optimizer import MacroOptimizer
+from engine.cache import ParseCache, CompiledFileCache
 from engine.executor import MacroExecutor
 from engine.recorder import ActionRecorder
 from utils.file_io import FileManager
+from utils.screen import ScreenGeometry
 
 
 class MacroBuilderWindow(QMainWindow):
@@ -31,10 +36,20 @@ class MacroBuilderWindow(QMainWindow):
         self.current_file = None
         self.file_manager = FileManager()
 
+        # Read the screen size on the GUI thread; macros run in a worker thread
+        ScreenGeometry.get_size()
+
         # Engine components
         self.context = ExecutionContext()
-        self.parser = ScriptParser(self.context)
+        self.parser = IncrementalParser(pure=True)                  # Live validation
+        self.run_parser = IncrementalParser(self.context, pure=True)  # Run button
         self.executor = MacroExecutor(self.context, gui_callback=self)
+        self.compiler = MacroCompiler()
+        self.optimizer = MacroOptimizer()
+        self.parse_cache = ParseCache(compiler=self.compiler, optimizer=self.optimizer)
+        # Debug runs are not optimized: merged waits and folded ifs lose their lines
+        self.debug_parse_cache = ParseCache(compiler=self.compiler)
+        self.file_cache = CompiledFileCache(self.parse_cache)
         self.recorder = ActionRecorder()
 
         # Debug state
@@ -204,7 +219,10 @@ class MacroBuilderWindow(QMainWindow):
 
         if path:
             try:
-                script, speed, iterations, metadata = self.file_manager.load_file(path)
+                # Loads the compiled .mbc tree (or builds it) into the parse cache
+                script, speed, iterations, metadata = self.file_cache.load_file(
+                    path, ScriptParser(pure=True)
+                )
                 self.editor.set_content(script)
                 self.controls.speed_slider.setValue(int(speed * 10))
                 self.controls.iterations_spin.setValue(iterations)
@@ -309,7 +327,7 @@ class MacroBuilderWindow(QMainWindow):
 
         # Clear previous context
         self.context = ExecutionContext()
-        self.parser = ScriptParser(self.context)
+        self.run_parser.context = self.context
         self.executor = MacroExecutor(self.context, gui_callback=self)
 
         # Apply debug settings
@@ -318,9 +336,10 @@ class MacroBuilderWindow(QMainWindow):
             for line_num in self.editor.get_breakpoints():
                 self.executor.add_breakpoint(line_num)
 
-        # Parse script
+        # Parse and compile script
+        parse_cache = self.debug_parse_cache if self.debug_mode else self.parse_cache
         try:
-            actions = self.parser.parse(script)
+            actions, _ = parse_cache.parse(self.run_parser, script)
         except SyntaxError as e:
             QMessageBox.critical(self, "Erreur", str(e))
             return
@@ -329,8 +348,7 @@ class MacroBuilderWindow(QMainWindow):
         self.controls.clear_console()
 
         # Reset executor state
-        self.executor.stop_event.clear()
-        self.executor.pause_event.clear()
+        self.executor.control.reset()
 
         # Get speed and iterations
         speed = self.controls.get_speed()
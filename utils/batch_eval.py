@@ -0,0 +1,238 @@
+"""
+Batch Expression Evaluation Module
+Evaluates one expression over columns of variable values (offline analysis)
+Vectorised with NumPy when available, row by row otherwise
+"""
+import ast
+import operator
+from functools import lru_cache
+from utils.safe_eval import (CMP_OPS, EXPR_CACHE_SIZE, OPS, coerce_value,
+                             compile_expr, parse_expr)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class BatchExpression:
+    """An expression compiled for evaluation over columns"""
+
+    def __init__(self, expr):
+        """
+        Compile an expression
+
+        Args:
+            expr: Expression text, with $name/@name variable references
+
+        Raises:
+            ValueError: If the expression is invalid or unsupported
+        """
+        self.scalar = compile_expr(expr)
+        self.text = self.scalar.text
+        self.names = self.scalar.names
+        self._vector = None
+
+        # Function calls (pixel, exists) only have a scalar form
+        if NUMPY_AVAILABLE and not self.scalar.calls:
+            body, placeholders = parse_expr(self.text)
+            self._vector = _compile_vector(body, placeholders)
+
+    def evaluate(self, columns, functions=None):
+        """
+        Evaluate the expression for every row
+
+        Args:
+            columns: Dict of variable name -> sequence of values, all of the
+                same length (one row per snapshot)
+            functions: Dict of functions for the scalar path (see
+                CompiledExpression.evaluate())
+
+        Returns:
+            NumPy array of results if NumPy is available, list otherwise
+
+        Raises:
+            KeyError: If a referenced variable has no column
+            ValueError: If columns differ in length, or a row fails to evaluate
+        """
+        size = _row_count(columns, self.names)
+
+        if self._vector is not None:
+            try:
+                arrays = {name: _as_array(columns[name]) for name in self.names}
+                with np.errstate(all='ignore'):
+                    result = self._vector(arrays)
+                return np.broadcast_to(np.asarray(result), (size,)).copy()
+            except (TypeError, ValueError):
+                # Mixed or text columns: evaluate row by row below
+                pass
+
+        results = []
+        for row in range(size):
+            values = {name: coerce_value(columns[name][row]) for name in self.names}
+            results.append(self.scalar.evaluate(values.__getitem__, functions))
+        return np.asarray(results) if NUMPY_AVAILABLE else results
+
+
+@lru_cache(maxsize=EXPR_CACHE_SIZE)
+def compile_batch(expr):
+    """
+    Compile an expression for batch evaluation (cached by text)
+
+    Args:
+        expr: Expression text
+
+    Returns:
+        BatchExpression instance
+    """
+    return BatchExpression(expr)
+
+
+def evaluate_batch(expr, columns, functions=None):
+    """
+    Evaluate an expression over columns of variable values
+
+    Example: evaluate_batch('$hp > 10 and $mana >= 5',
+                            {'$hp': [5, 20, 30], '$mana': [9, 1, 6]})
+    gives [False, False, True].
+
+    Args:
+        expr: Expression text
+        columns: Dict of variable name -> sequence of values
+        functions: Dict of functions for expressions calling pixel()/exists()
+
+    Returns:
+        NumPy array of results if NumPy is available, list otherwise
+    """
+    return compile_batch(expr).evaluate(columns, functions)
+
+
+def _row_count(columns, names):
+    """
+    Get the number of rows of the columns used by an expression
+
+    Args:
+        columns: Dict of variable name -> sequence of values
+        names: Variables referenced by the expression
+
+    Returns:
+        Number of rows
+
+    Raises:
+        KeyError: If a referenced variable has no column
+        ValueError: If columns differ in length
+    """
+    sizes = {len(columns[name]) for name in names}
+    if len(sizes) > 1:
+        raise ValueError(f"Columns differ in length: {sorted(sizes)}")
+    if sizes:
+        return sizes.pop()
+    return len(next(iter(columns.values()))) if columns else 1
+
+
+def _as_array(values):
+    """
+    Convert a column to a NumPy array, numeric strings as numbers
+
+    Args:
+        values: Sequence of values
+
+    Returns:
+        NumPy array
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in 'UO':
+        array = np.asarray([coerce_value(v) for v in values])
+    if array.dtype.kind in 'UO':
+        raise TypeError("Non-numeric column")
+    return array
+
+
+def _compile_vector(node, placeholders):
+    """
+    Compile an AST node into a closure working on column arrays
+
+    Args:
+        node: AST node
+        placeholders: Dict of placeholder identifier -> variable name
+
+    Returns:
+        Callable(arrays) -> array or scalar
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda arrays: value
+
+    if isinstance(node, ast.Name):
+        name = placeholders.get(node.id)
+        if name is None:
+            return lambda arrays: 0
+        return lambda arrays: arrays[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in OPS:
+        op = OPS[type(node.op)]
+        left = _compile_vector(node.left, placeholders)
+        right = _compile_vector(node.right, placeholders)
+        if op in (operator.truediv, operator.mod):
+            return lambda arrays: _checked_divide(op, left(arrays), right(arrays))
+        return lambda arrays: op(left(arrays), right(arrays))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_vector(node.operand, placeholders)
+        if isinstance(node.op, ast.Not):
+            return lambda arrays: np.logical_not(operand(arrays))
+        if type(node.op) in OPS:
+            op = OPS[type(node.op)]
+            return lambda arrays: op(operand(arrays))
+
+    if isinstance(node, ast.Compare):
+        left = _compile_vector(node.left, placeholders)
+        steps = [(CMP_OPS[type(op)], _compile_vector(comparator, placeholders))
+                 for op, comparator in zip(node.ops, node.comparators)]
+
+        def compare_chain(arrays):
+            current = left(arrays)
+            result = True
+            for op, operand in steps:
+                right = operand(arrays)
+                result = np.logical_and(result, op(current, right))
+                current = right
+            return result
+        return compare_chain
+
+    if isinstance(node, ast.BoolOp):
+        values = [_compile_vector(v, placeholders) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def bool_op(arrays):
+            result = np.asarray(values[0](arrays), dtype=bool)
+            for value in values[1:]:
+                result = combine(result, np.asarray(value(arrays), dtype=bool))
+            return result
+        return bool_op
+
+    raise ValueError("Opération non supportée dans expression")
+
+
+def _checked_divide(op, left, right):
+    """
+    Divide like the scalar evaluator: a division by zero is an error
+
+    NumPy returns inf/nan instead; raising sends the batch to the scalar
+    path, which reports the failing row.
+
+    Args:
+        op: operator.truediv or operator.mod
+        left: Dividend (array or scalar)
+        right: Divisor (array or scalar)
+
+    Returns:
+        Quotient or remainder
+
+    Raises:
+        ValueError: If any divisor is zero
+    """
+    if np.any(np.asarray(right) == 0):
+        raise ValueError("division by zero")
+    return op(left, right)
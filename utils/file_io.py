@@ -24,6 +24,28 @@ class FileManager:
         with open(filepath, 'r', encoding='utf-8') as f:
             return f.read()
 
+    @staticmethod
+    def iter_lines(filepath):
+        """
+        Read a script file line by line without loading it whole
+
+        JSON macros store the script in a single field, so they are loaded
+        and split instead.
+
+        Args:
+            filepath: Path to the file
+
+        Yields:
+            Script lines without their line terminators
+        """
+        if FileManager.detect_format(filepath) == 'json':
+            yield from FileManager.load_json(filepath)['script'].splitlines()
+            return
+
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
     @staticmethod
     def save_text(filepath, content):
         """
@@ -112,6 +134,10 @@ class FileManager:
         # Try to detect by parsing
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
+                # Only a JSON object can be a V4 macro; don't read big scripts
+                if f.read(4096).lstrip()[:1] != '{':
+                    return 'text'
+                f.seek(0)
                 data = json.load(f)
                 if isinstance(data, dict) and 'version' in data:
                     return 'json'
@@ -1,9 +1,15 @@
 """
 Safe Expression Evaluation Module
 Supports arithmetic, comparisons, and boolean operations without using eval()
+Expressions are compiled once into closures and cached by text
 """
 import ast
 import operator
+import re
+from functools import lru_cache
+
+# Variable references ($name, @name); the longest name wins
+VAR_REF_PATTERN = re.compile(r'[$@][A-Za-z_]\w*')
 
 # Supported operators
 OPS = {
@@ -29,66 +35,243 @@ BOOL_OPS = {
     ast.Or: any
 }
 
+# Functions usable in expressions; implementations are given at evaluation
+EXPR_FUNCTIONS = ('pixel', 'exists')
+
+# Number of compiled expressions kept
+EXPR_CACHE_SIZE = 512
+
+
+class CompiledExpression:
+    """An expression compiled into nested closures"""
+
+    __slots__ = ('text', 'names', 'calls', '_fn')
+
+    def __init__(self, text, names, calls, fn):
+        """
+        Initialize compiled expression
+
+        Args:
+            text: Expression text
+            names: Tuple of the variables it references ($name, @name)
+            calls: Tuple of the functions it calls (e.g. 'pixel')
+            fn: Closure taking a resolver and the functions
+        """
+        self.text = text
+        self.names = names
+        self.calls = calls
+        self._fn = fn
+
+    def evaluate(self, resolve, functions=None):
+        """
+        Evaluate the expression
+
+        `and`/`or` short-circuit: an operand is only evaluated if the
+        result still depends on it, so cheap tests placed first spare the
+        expensive ones (pixel probes).
+
+        Args:
+            resolve: Callable returning the value of a variable name;
+                raises KeyError (or any error) if it is undefined
+            functions: Dict of callable functions (name -> callable);
+                `exists` receives the variable name rather than its value
+
+        Returns:
+            Result value
+
+        Raises:
+            ValueError: If evaluation fails
+        """
+        try:
+            return self._fn(resolve, functions or {})
+        except Exception as e:
+            raise ValueError(f"Expression invalide : {self.text} -> {e}")
+
+
+@lru_cache(maxsize=EXPR_CACHE_SIZE)
+def compile_expr(expr):
+    """
+    Compile an expression (cached by text, LRU eviction)
+
+    Args:
+        expr: Expression text, with $name/@name variable references
+
+    Returns:
+        CompiledExpression instance
+
+    Raises:
+        ValueError: If the expression is invalid or unsupported
+    """
+    expr = expr.strip()
+    calls = []
+    try:
+        body, placeholders = parse_expr(expr)
+        fn = _compile_node(body, placeholders, calls)
+    except Exception as e:
+        raise ValueError(f"Expression invalide : {expr} -> {e}")
+    return CompiledExpression(expr, tuple(placeholders.values()), tuple(dict.fromkeys(calls)), fn)
+
+
+def parse_expr(expr):
+    """
+    Parse an expression into a Python AST
+
+    Args:
+        expr: Expression text, with $name/@name variable references
+
+    Returns:
+        Tuple of (AST body node, dict of placeholder identifier -> variable name)
+
+    Raises:
+        SyntaxError: If the expression is not valid
+    """
+    # Les variables deviennent des identifiants Python (_v0, _v1...) pour le parsing
+    placeholders = {}
+
+    def _placeholder(match):
+        name = match.group(0)
+        for placeholder, known in placeholders.items():
+            if known == name:
+                return placeholder
+        placeholder = f"_v{len(placeholders)}"
+        placeholders[placeholder] = name
+        return placeholder
+
+    source = VAR_REF_PATTERN.sub(_placeholder, expr.strip())
+    return ast.parse(source, mode='eval').body, placeholders
+
 
 def safe_eval_expr(expr, variables=None):
     """
     Évalue une expression (arithmétique / logique) en toute sécurité.
     Supporte +, -, *, /, %, comparaisons, et, ou, not, et variables ($x).
+    Les variables absentes de `variables` rendent l'expression invalide.
     """
     variables = variables or {}
-    expr = expr.strip()
-    # Remplace les variables simples par des identifiants temporaires (pour parsing)
-    # On remplace $var par var__val0 puis on injecte dans un env lors de l'évaluation
-    env = {}
-    idx = 0
-    for k, v in variables.items():
-        placeholder = f"_v{idx}"
-        expr = expr.replace(k, placeholder)
-        env[placeholder] = v
-        idx += 1
+    return compile_expr(expr).evaluate(variables.__getitem__)
+
+
+def coerce_value(value):
+    """
+    Convert numeric strings to numbers
+
+    Variables set from text (input, failed assignments) hold strings;
+    conditions compare them as numbers when they look like numbers.
+
+    Args:
+        value: Variable value
 
+    Returns:
+        int or float for numeric strings, the value unchanged otherwise
+    """
+    if not isinstance(value, str):
+        return value
     try:
-        tree = ast.parse(expr, mode='eval')
-        return _eval_ast(tree.body, env)
-    except Exception as e:
-        raise ValueError(f"Expression invalide : {expr} -> {e}")
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _compile_node(node, placeholders, calls):
+    """
+    Compile an AST node into a closure taking a resolver and the functions
 
+    Args:
+        node: AST node
+        placeholders: Dict of placeholder identifier -> variable name
+        calls: List collecting the names of the called functions
 
-def _eval_ast(node, env=None):
-    """Evaluate AST node recursively"""
-    env = env or {}
+    Returns:
+        Callable(resolve, functions) -> value
+    """
     if isinstance(node, ast.Constant):
-        return node.value
-    if isinstance(node, ast.Num):  # compat
-        return node.n
+        value = node.value
+        return lambda resolve, functions: value
+
     if isinstance(node, ast.Name):
-        # récupère depuis env si présent
-        return env.get(node.id, 0)
-    if isinstance(node, ast.BinOp):
-        if type(node.op) in OPS:
-            return OPS[type(node.op)](_eval_ast(node.left, env), _eval_ast(node.right, env))
+        name = placeholders.get(node.id)
+        if name is None:
+            # Identifiant inconnu : vaut 0
+            return lambda resolve, functions: 0
+        return lambda resolve, functions: resolve(name)
+
+    if isinstance(node, ast.BinOp) and type(node.op) in OPS:
+        op = OPS[type(node.op)]
+        left = _compile_node(node.left, placeholders, calls)
+        right = _compile_node(node.right, placeholders, calls)
+        return lambda resolve, functions: op(left(resolve, functions), right(resolve, functions))
+
     if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand, placeholders, calls)
         if isinstance(node.op, ast.Not):
-            return not _eval_ast(node.operand, env)
+            return lambda resolve, functions: not operand(resolve, functions)
         if type(node.op) in OPS:
-            return OPS[type(node.op)](_eval_ast(node.operand, env))
+            op = OPS[type(node.op)]
+            return lambda resolve, functions: op(operand(resolve, functions))
+
     if isinstance(node, ast.Compare):
-        left = _eval_ast(node.left, env)
-        result = True
-        for op, comparator in zip(node.ops, node.comparators):
-            if type(op) in CMP_OPS:
-                right = _eval_ast(comparator, env)
-                result = CMP_OPS[type(op)](left, right)
-                left = right
-            else:
+        for op in node.ops:
+            if type(op) not in CMP_OPS:
                 raise ValueError("Comparaison non supportée")
-        return result
-    if isinstance(node, ast.BoolOp):
-        vals = [_eval_ast(v, env) for v in node.values]
-        if type(node.op) in BOOL_OPS:
-            func = BOOL_OPS[type(node.op)]
-            # and -> all, or -> any ; on considère les valeurs truthy
-            return func([bool(v) for v in vals])
+        left = _compile_node(node.left, placeholders, calls)
+        if len(node.ops) == 1:
+            op = CMP_OPS[type(node.ops[0])]
+            right = _compile_node(node.comparators[0], placeholders, calls)
+            return lambda resolve, functions: op(left(resolve, functions), right(resolve, functions))
+
+        steps = [(CMP_OPS[type(op)], _compile_node(comparator, placeholders, calls))
+                 for op, comparator in zip(node.ops, node.comparators)]
+
+        def compare_chain(resolve, functions):
+            # a < b < c  <=>  a < b and b < c
+            current = left(resolve, functions)
+            for op, operand in steps:
+                right = operand(resolve, functions)
+                if not op(current, right):
+                    return False
+                current = right
+            return True
+        return compare_chain
+
+    if isinstance(node, ast.BoolOp) and type(node.op) in BOOL_OPS:
+        values = [_compile_node(v, placeholders, calls) for v in node.values]
+
+        # Short-circuit : on s'arrête dès que le résultat est connu
+        if isinstance(node.op, ast.And):
+            def bool_and(resolve, functions):
+                for value in values:
+                    if not value(resolve, functions):
+                        return False
+                return True
+            return bool_and
+
+        def bool_or(resolve, functions):
+            for value in values:
+                if value(resolve, functions):
+                    return True
+            return False
+        return bool_or
+
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and
+            node.func.id in EXPR_FUNCTIONS and not node.keywords):
+        func_name = node.func.id
+        calls.append(func_name)
+
+        if func_name == 'exists':
+            # exists($var) tests the variable itself, not its value
+            if len(node.args) != 1 or not isinstance(node.args[0], ast.Name) or \
+                    node.args[0].id not in placeholders:
+                raise ValueError("exists() attend une variable")
+            var_name = placeholders[node.args[0].id]
+            return lambda resolve, functions: functions['exists'](var_name)
+
+        args = [_compile_node(arg, placeholders, calls) for arg in node.args]
+        return lambda resolve, functions: functions[func_name](*[arg(resolve, functions) for arg in args])
+
     raise ValueError("Opération non supportée dans expression")
 
 
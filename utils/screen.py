@@ -0,0 +1,123 @@
+"""
+Screen Geometry Module
+Provides the screen size to the engine without depending on a GUI toolkit
+"""
+import sys
+
+
+def system_screen_size():
+    """
+    Read the primary screen size from the system, without Qt
+
+    Used by the headless runner. Windows is asked directly; elsewhere
+    tkinter is tried if a display is available.
+
+    Returns:
+        Tuple of (width, height), or (0, 0) if it cannot be read
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            user32 = ctypes.windll.user32
+            return (user32.GetSystemMetrics(0), user32.GetSystemMetrics(1))
+
+        import tkinter
+        root = tkinter.Tk()
+        try:
+            root.withdraw()
+            return (root.winfo_screenwidth(), root.winfo_screenheight())
+        finally:
+            root.destroy()
+    except Exception:
+        return (0, 0)
+
+
+class ScreenGeometry:
+    """Screen size cached for the whole process"""
+
+    _size = None                  # Cached (width, height)
+    _backend = None               # Optional callable returning (width, height)
+    _watching = False             # Qt change signals connected
+
+    @classmethod
+    def set_backend(cls, backend):
+        """
+        Use a custom source for the screen size (headless mode, tests)
+
+        Args:
+            backend: Callable returning (width, height), or None to go
+                back to the running Qt application
+        """
+        cls._backend = backend
+        cls._size = None
+
+    @classmethod
+    def get_size(cls):
+        """
+        Get the screen size
+
+        Read from the backend if one is set, otherwise from the primary
+        screen of the running Qt application (Qt is never imported here).
+        Without either the size is (0, 0).
+
+        Returns:
+            Tuple of (width, height)
+        """
+        if cls._size is None:
+            cls._size = cls._read()
+        return cls._size
+
+    @classmethod
+    def refresh(cls, *args):
+        """Read the size again now (connected to Qt display-change signals)"""
+        cls._size = cls._read()
+
+    @classmethod
+    def _read(cls):
+        """
+        Read the current screen size from the active source
+
+        Returns:
+            Tuple of (width, height)
+        """
+        if cls._backend is not None:
+            try:
+                w, h = cls._backend()
+                return (int(w), int(h))
+            except Exception:
+                return (0, 0)
+
+        qt_widgets = sys.modules.get('PyQt5.QtWidgets')
+        app = qt_widgets.QApplication.instance() if qt_widgets else None
+        if app is None:
+            return (0, 0)
+
+        screen = app.primaryScreen()
+        if screen is None:
+            return (0, 0)
+
+        cls._watch(app, screen)
+        geometry = screen.geometry()
+        return (geometry.width(), geometry.height())
+
+    @classmethod
+    def _watch(cls, app, screen):
+        """
+        Refresh the cached size when the displays change
+
+        Args:
+            app: Running QApplication
+            screen: Primary QScreen
+        """
+        if cls._watching:
+            return
+        cls._watching = True
+
+        def on_primary_changed(new_screen):
+            new_screen.geometryChanged.connect(cls.refresh)
+            cls.refresh()
+
+        app.primaryScreenChanged.connect(on_primary_changed)
+        app.screenAdded.connect(cls.refresh)
+        app.screenRemoved.connect(cls.refresh)
+        screen.geometryChanged.connect(cls.refresh)
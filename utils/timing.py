@@ -0,0 +1,249 @@
+"""
+Timing Module
+Schedules timed commands against absolute deadlines so delays do not drift
+A virtual clock replaces real sleeps when simulating a macro
+"""
+import threading
+import time
+
+# Remaining time below which a wait spins instead of sleeping (seconds)
+DEFAULT_SPIN_THRESHOLD = 0.002
+
+# Lateness beyond which the timeline restarts from now (seconds)
+DEFAULT_MAX_LAG = 0.05
+
+
+class ControlSignal:
+    """threading.Event lookalike whose changes wake the waits of a RunControl"""
+
+    def __init__(self, condition):
+        """
+        Initialize signal
+
+        Args:
+            condition: threading.Condition shared by the signals of a RunControl
+        """
+        self._condition = condition
+        self._flag = False
+
+    def set(self):
+        """Raise the signal and wake the waiting threads"""
+        with self._condition:
+            self._flag = True
+            self._condition.notify_all()
+
+    def clear(self):
+        """Lower the signal and wake the waiting threads"""
+        with self._condition:
+            self._flag = False
+            self._condition.notify_all()
+
+    def is_set(self):
+        """Check whether the signal is raised"""
+        return self._flag
+
+    def wait(self, timeout=None):
+        """
+        Block until the signal is raised
+
+        Args:
+            timeout: Maximum time to wait in seconds (None: no limit)
+
+        Returns:
+            True if the signal is raised, False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._flag, timeout)
+
+
+class RunControl:
+    """Stop/pause state of a run, with waits that wake as soon as it changes"""
+
+    def __init__(self):
+        """Initialize control (neither stopped nor paused)"""
+        self._condition = threading.Condition()
+        self.stop_event = ControlSignal(self._condition)
+        self.pause_event = ControlSignal(self._condition)
+
+    def reset(self):
+        """Clear the stop and pause signals before a new run"""
+        self.stop_event.clear()
+        self.pause_event.clear()
+
+    def sleep(self, seconds):
+        """
+        Sleep, waking early if the run is stopped or paused
+
+        Args:
+            seconds: Maximum duration in seconds
+
+        Returns:
+            True if the full duration elapsed, False if interrupted
+        """
+        with self._condition:
+            return not self._condition.wait_for(self._interrupted, seconds)
+
+    def wait_resumed(self):
+        """
+        Block while the run is paused (returns at once on stop)
+
+        Returns:
+            True if the run can continue, False if it was stopped
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self.pause_event.is_set() or self.stop_event.is_set())
+        return not self.stop_event.is_set()
+
+    def _interrupted(self):
+        return self.stop_event.is_set() or self.pause_event.is_set()
+
+
+class VirtualClock:
+    """Simulated clock: sleeping advances it at once instead of blocking"""
+
+    def __init__(self, start=0.0):
+        """
+        Initialize clock
+
+        Args:
+            start: Initial time in seconds
+        """
+        self.now = start
+
+    def __call__(self):
+        """Get the current simulated time in seconds"""
+        return self.now
+
+    def sleep(self, seconds):
+        """
+        Advance the clock (drop-in for time.sleep and RunControl.sleep)
+
+        Args:
+            seconds: Duration in seconds
+
+        Returns:
+            True (a simulated sleep is never interrupted)
+        """
+        if seconds > 0:
+            self.now += seconds
+        return True
+
+
+class PrecisionScheduler:
+    """Deadline-based waits with sleep-then-spin accuracy"""
+
+    def __init__(self, clock=None, sleep=None, spin_threshold=DEFAULT_SPIN_THRESHOLD,
+                 max_lag=DEFAULT_MAX_LAG, control=None):
+        """
+        Initialize scheduler
+
+        Args:
+            clock: Monotonic clock returning seconds (default: time.perf_counter)
+            sleep: Sleep function taking seconds (default: control.sleep if a
+                control is given, time.sleep otherwise)
+            spin_threshold: Remaining time handled by spinning on the clock,
+                to absorb the OS sleep granularity (0 to never spin)
+            max_lag: Lateness that is caught up on; a wait starting later
+                than this after the previous deadline restarts the timeline
+            control: Optional RunControl; waits end at once on stop and are
+                extended by the time spent paused
+        """
+        self.clock = clock or time.perf_counter
+        self.sleep = sleep or (control.sleep if control is not None else time.sleep)
+        self.control = control
+        self.spin_threshold = spin_threshold
+        self.max_lag = max_lag
+
+        self.deadline = None            # Absolute deadline of the last wait
+        self.reset_stats()
+
+    def reset(self):
+        """Start a new timeline (the next wait counts from now)"""
+        self.deadline = None
+
+    def wait(self, seconds):
+        """
+        Wait until `seconds` after the previous deadline
+
+        Consecutive waits are chained on absolute deadlines: the time spent
+        running commands between them is deducted from the next wait, so
+        a loop of 10000 `wait,0.01` takes 100 s instead of 100 s plus the
+        overhead of every iteration.
+
+        Args:
+            seconds: Duration in seconds
+
+        Returns:
+            True if the wait completed, False if the run was stopped
+        """
+        now = self.clock()
+        if self.deadline is None or now - self.deadline > self.max_lag:
+            if self.deadline is not None:
+                self.resyncs += 1
+            self.deadline = now
+        self.deadline += max(seconds, 0)
+        return self.wait_until(self.deadline)
+
+    def wait_until(self, deadline):
+        """
+        Block until an absolute time of the clock
+
+        Sleeps while more than spin_threshold remains, then spins. A pause
+        pushes the deadline back by its duration, so the wait resumes with
+        the time it had left.
+
+        Args:
+            deadline: Target time on self.clock
+
+        Returns:
+            True if the deadline was reached, False if the run was stopped
+        """
+        clock = self.clock
+        control = self.control
+        remaining = deadline - clock()
+        while remaining > 0:
+            if control is not None:
+                if control.stop_event.is_set():
+                    return False
+                if control.pause_event.is_set():
+                    paused_at = clock()
+                    if not control.wait_resumed():
+                        return False
+                    delay = clock() - paused_at
+                    deadline += delay
+                    if self.deadline is not None:
+                        self.deadline += delay
+                    remaining = deadline - clock()
+                    continue
+            if remaining > self.spin_threshold:
+                self.sleep(remaining - self.spin_threshold)
+            remaining = deadline - clock()
+
+        lateness = -remaining
+        self.waits += 1
+        self.total_jitter += lateness
+        if lateness > self.max_jitter:
+            self.max_jitter = lateness
+        return True
+
+    def reset_stats(self):
+        """Clear the jitter statistics"""
+        self.waits = 0                  # Completed waits
+        self.total_jitter = 0.0         # Sum of the lateness of each wait
+        self.max_jitter = 0.0           # Worst lateness
+        self.resyncs = 0                # Timeline restarts after a large lag
+
+    def get_stats(self):
+        """
+        Get jitter statistics (lateness of each wait past its deadline)
+
+        Returns:
+            Dict with waits, mean_jitter, max_jitter (seconds) and resyncs
+        """
+        return {
+            'waits': self.waits,
+            'mean_jitter': self.total_jitter / self.waits if self.waits else 0.0,
+            'max_jitter': self.max_jitter,
+            'resyncs': self.resyncs
+        }